@@ -0,0 +1,90 @@
+# Deterministic synthetic corpus of account documents for benchmarks.
+#
+# Produces N accounts x M documents with realistic filenames (9-digit number,
+# an ORDER keyword, optional 'Stm. Date - mm_dd_yyyy'), a mix of PDF, TIFF and
+# JPEG sources, and varying page counts and orientations.
+
+import argparse
+import os
+import random
+import sys
+
+import fitz
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import ORDER  # noqa: E402
+
+# ----------------- CONFIG -----------------
+
+EXTRA_KEYWORDS = ["Misc Letter", "Call Notes"]  # outside ORDER, dropped by merge
+FORMAT_WEIGHTS = {"pdf": 6, "tif": 3, "jpg": 1}
+PORTRAIT = (612, 792)
+LANDSCAPE = (792, 612)
+
+
+# ----------------- GENERATORS -----------------
+
+def make_pdf(path, rng):
+    """Write a PDF with 1-8 pages in mixed orientations."""
+    with fitz.open() as doc:
+        for page_no in range(rng.randint(1, 8)):
+            width, height = LANDSCAPE if rng.random() < 0.2 else PORTRAIT
+            page = doc.new_page(width=width, height=height)
+            page.insert_text((72, 72), f"{os.path.basename(path)} page {page_no + 1}", fontsize=11)
+        doc.save(path)
+
+
+def make_image(path, rng, fmt):
+    """Write a scanned-page style image; TIFFs are bilevel like fax scans."""
+    width, height = (1100, 850) if rng.random() < 0.2 else (850, 1100)
+    if fmt == "tif":
+        img = Image.new("1", (width, height), 1)
+        for _ in range(200):
+            x, y = rng.randrange(width - 40), rng.randrange(height - 4)
+            img.paste(0, (x, y, x + 40, y + 4))
+        img.save(path, "TIFF", compression="group4")
+    else:
+        img = Image.new("RGB", (width, height), (rng.randrange(200, 256),) * 3)
+        img.save(path, "JPEG", quality=85)
+
+
+def make_filename(rng, unique_number, ext):
+    """Build a filename the way documents arrive on the share."""
+    keyword = rng.choice(ORDER + EXTRA_KEYWORDS)
+    name = f"{unique_number} {keyword}"
+    if "Bill Statement" in keyword or rng.random() < 0.3:
+        name += f" Stm. Date - {rng.randint(1, 12):02d}_{rng.randint(1, 28):02d}_{rng.randint(2015, 2025)}"
+    return f"{name} {rng.randrange(10 ** 6):06d}.{ext}"
+
+
+def generate_corpus(output_dir, accounts=50, documents=8, seed=1234):
+    """Create the corpus under output_dir and return its 9-digit numbers."""
+    rng = random.Random(seed)
+    formats = [fmt for fmt, weight in FORMAT_WEIGHTS.items() for _ in range(weight)]
+    numbers = []
+    for _ in range(accounts):
+        unique_number = f"{rng.randrange(10 ** 8, 10 ** 9)}"
+        numbers.append(unique_number)
+        account_dir = os.path.join(output_dir, f"Batch {unique_number[:3]}", unique_number)
+        os.makedirs(account_dir, exist_ok=True)
+        for _ in range(documents):
+            fmt = rng.choice(formats)
+            path = os.path.join(account_dir, make_filename(rng, unique_number, fmt))
+            if fmt == "pdf":
+                make_pdf(path, rng)
+            else:
+                make_image(path, rng, fmt)
+        # Files the scanner must skip
+        open(os.path.join(account_dir, f"{unique_number} email.eml"), "w").close()
+    return numbers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic account corpus.")
+    parser.add_argument("output_dir")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+    generate_corpus(args.output_dir, args.accounts, args.documents, args.seed)
@@ -0,0 +1,132 @@
+# Per-stage timing benchmarks on a synthetic corpus.
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py --save-baseline   # record baseline.json
+#   python benchmarks/run_benchmarks.py                   # compare, exit 1 on regression
+
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+from report import ResultsReport  # noqa: E402
+from corpus import generate_corpus  # noqa: E402
+
+# ----------------- CONFIG -----------------
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+REGRESSION_THRESHOLD = 1.25  # fail when a stage is 25% slower than its baseline
+REGRESSION_MIN_SECONDS = 0.02  # ...and at least this much slower (timer noise on fast stages)
+REPEATS = 3
+
+
+# ----------------- STAGES -----------------
+
+@functools.lru_cache(maxsize=None)
+def scanned(corpus_dir):
+    """Scan the corpus once, so stages after the scan are timed on their own."""
+    return main.scan_files(corpus_dir)
+
+
+def bench_scan(corpus_dir, work_dir):
+    main.scan_files(corpus_dir)
+
+
+def bench_convert(corpus_dir, work_dir):
+    for documents in scanned(corpus_dir).values():
+        for index, (path, _, name) in enumerate(documents):
+            if main.is_image(path) and main.get_sort_key(name) < len(main.ORDER):
+                main.convert_to_pdf(path, os.path.join(work_dir, f"converted_{index}.pdf"))
+
+
+def bench_merge(corpus_dir, work_dir):
+    # Single pass per account: each source is opened, validated and inserted once.
+    for unique_number, documents in scanned(corpus_dir).items():
+        main.merge_documents(unique_number, documents, work_dir)
+
+
+def bench_report(corpus_dir, work_dir):
+    with ResultsReport(work_dir) as report:
+        for n in range(10000):
+            merged = n % 7 != 0
+            report.append([f"{n:09d}", f"{n % 999999:06d}", "x" if merged else "", 6, 2, n % 3,
+                           40, 2500000, 1.25, None if merged else "bad.pdf: broken xref"])
+
+
+STAGES = {
+    "scan": bench_scan,
+    "convert": bench_convert,
+    "merge": bench_merge,
+    "report": bench_report,
+}
+
+
+# ----------------- RUNNER -----------------
+
+def time_stage(func, corpus_dir, repeats=REPEATS):
+    """Return the best wall time of func over several runs."""
+    best = None
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as work_dir:
+            start = time.perf_counter()
+            func(corpus_dir, work_dir)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(accounts, documents, seed, stages):
+    """Generate the corpus once and time each stage on it."""
+    timings = {}
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        generate_corpus(corpus_dir, accounts, documents, seed)
+        for name in stages:
+            timings[name] = time_stage(STAGES[name], corpus_dir)
+            print(f"{name:<10} {timings[name]:8.3f}s")
+    return timings
+
+
+def compare(timings, baseline, threshold):
+    """Return the stages that regressed past the threshold."""
+    regressions = []
+    for name, elapsed in timings.items():
+        reference = baseline.get(name)
+        if reference and elapsed > reference * threshold and elapsed - reference > REGRESSION_MIN_SECONDS:
+            regressions.append(name)
+            print(f"REGRESSION {name}: {elapsed:.3f}s vs baseline {reference:.3f}s")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scan/convert/merge/report stages.")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    timings = run(args.accounts, args.documents, args.seed, args.stages)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"corpus": [args.accounts, args.documents, args.seed], "timings": timings}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline first.")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    if stored["corpus"] != [args.accounts, args.documents, args.seed]:
+        print("Baseline was recorded on a different corpus; comparison skipped.")
+        sys.exit(0)
+    sys.exit(1 if compare(timings, stored["timings"], args.threshold) else 0)
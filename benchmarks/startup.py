@@ -0,0 +1,86 @@
+# Startup-time guard for the GUI and the processing engine.
+#
+# Runs `python -X importtime` in a fresh interpreter for each module and
+# compares the cumulative import time with a stored baseline. It also fails
+# if importing main pulls in a heavy dependency that should load lazily.
+#
+# Usage:
+#   python benchmarks/startup.py --save-baseline
+#   python benchmarks/startup.py
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# ----------------- CONFIG -----------------
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+MODULES = ["main", "gui"]
+LAZY_MODULES = ["fitz", "PIL", "reportlab", "pyodbc", "openpyxl", "psutil"]
+REGRESSION_THRESHOLD = 1.25
+REPEATS = 5
+
+
+# ----------------- MEASUREMENT -----------------
+
+def import_time(module):
+    """Return the cumulative import time of module in seconds (best of REPEATS)."""
+    best = None
+    for _ in range(REPEATS):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{result.stderr}")
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            parts = [part.strip() for part in line.split("|")]
+            if len(parts) == 3 and parts[2] == module:
+                cumulative = int(parts[1]) / 1e6
+                best = cumulative if best is None else min(best, cumulative)
+    return best
+
+
+def eager_imports(module="main"):
+    """Return the heavy modules that importing module loads."""
+    code = f"import sys, {module}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guard import-time startup cost.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    failed = False
+    eager = eager_imports()
+    if eager:
+        print(f"main imports heavy modules eagerly: {', '.join(eager)}")
+        failed = True
+
+    timings = {}
+    for module in args.modules:
+        timings[module] = import_time(module)
+        print(f"{module:<6} {timings[module]:8.3f}s")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(timings, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for module, elapsed in timings.items():
+            reference = baseline.get(module)
+            if reference and elapsed > reference * args.threshold:
+                print(f"REGRESSION {module}: {elapsed:.3f}s vs baseline {reference:.3f}s")
+                failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,73 @@
+# Directory traversal benchmark on a simulated high-latency file system.
+#
+# Builds a tree shaped like the input share (batch folders with one folder per
+# account), then adds a fixed delay to every os.scandir call to mimic an SMB
+# round trip. Compares os.walk with fastwalk.parallel_walk and checks that
+# both produce exactly the same (root, dirs, files) sequence.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastwalk import WALK_WORKERS, parallel_walk  # noqa: E402
+
+# ----------------- CONFIG -----------------
+
+LATENCY = 0.005  # seconds per directory listing
+
+
+def build_tree(root, batches=20, accounts=25, files=4):
+    """Create batches x accounts folders with a few empty documents each."""
+    for batch in range(batches):
+        for account in range(accounts):
+            number = f"{100000000 + batch * 1000 + account}"
+            folder = os.path.join(root, f"Batch {batch:03d}", number, "Statements")
+            os.makedirs(folder)
+            for index in range(files):
+                open(os.path.join(folder, f"{number} Bill Statement {index}.pdf"), "w").close()
+
+
+def with_latency(latency):
+    """Patch os.scandir (used by os.walk too) to sleep before each listing."""
+    real_scandir = os.scandir
+
+    def slow_scandir(path="."):
+        time.sleep(latency)
+        return real_scandir(path)
+
+    os.scandir = slow_scandir
+    return real_scandir
+
+
+def timed(walk):
+    start = time.perf_counter()
+    result = list(walk)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare os.walk with parallel_walk under latency.")
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--accounts", type=int, default=25)
+    parser.add_argument("--workers", type=int, default=WALK_WORKERS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        build_tree(root, args.batches, args.accounts)
+        real_scandir = with_latency(args.latency)
+        try:
+            walk_time, expected = timed(os.walk(root))
+            fast_time, actual = timed(parallel_walk(root, args.workers))
+        finally:
+            os.scandir = real_scandir
+
+    print(f"directories      {len(expected)}")
+    print(f"os.walk          {walk_time:8.3f}s")
+    print(f"parallel_walk    {fast_time:8.3f}s  ({walk_time / fast_time:.1f}x)")
+    if actual != expected:
+        print("MISMATCH: parallel_walk output differs from os.walk")
+        sys.exit(1)
@@ -0,0 +1,118 @@
+# Filename classification.
+#
+# A filename is parsed once, at scan time, into a FileRecord holding its
+# 9-digit number, ORDER category index and statement date; the record then
+# travels with the document. The ORDER keywords are lower-cased once up
+# front, and the rules can be overridden from a JSON file.
+
+import functools
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+# ----------------- CONFIG -----------------
+
+DEFAULT_ORDER = [
+    "Terms",
+    "Supplemental Borrower",
+    "Bill Statement - CHARGE OFF",
+    "Bill Statement",
+    "Pay History",
+    "Sales Memo",
+    "GOODBYE",
+    "OwnershipChain",
+    "DataString",
+]
+DEFAULT_NUMBER_PATTERN = r"\d{9}"
+DEFAULT_DATE_PATTERN = r"Stm\. Date - (\d{1,2}_\d{1,2}_\d{4})"
+DEFAULT_DATE_FORMAT = "%m_%d_%Y"
+DATE_CACHE_SIZE = 4096
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "classification.json")
+
+
+# ----------------- RECORDS -----------------
+
+class FileRecord:
+    """Parsed filename: 9-digit number, ORDER category index and date."""
+
+    __slots__ = ("number", "category", "date")
+
+    def __init__(self, number, category, date):
+        self.number = number
+        self.category = category
+        self.date = date
+
+    def __repr__(self):
+        return f"FileRecord({self.number!r}, {self.category!r}, {self.date!r})"
+
+
+# ----------------- RULES -----------------
+
+class FilenameRules:
+    """Compiled ORDER keywords and number/date patterns."""
+
+    def __init__(self, order=DEFAULT_ORDER, number_pattern=DEFAULT_NUMBER_PATTERN,
+                 date_pattern=DEFAULT_DATE_PATTERN, date_format=DEFAULT_DATE_FORMAT):
+        self.order = list(order)
+        self.number_pattern = number_pattern
+        self.date_pattern = date_pattern
+        self.date_format = date_format
+
+        self.number_re = re.compile(number_pattern)
+        self.date_re = re.compile(date_pattern)
+        # Plain substring tests against pre-lowered keywords beat a combined
+        # regex here: the keyword list is short and `in` runs in C.
+        self._keywords = [keyword.lower() for keyword in self.order]
+        # strptime is slow and statement dates repeat across many files.
+        self._parse_date = functools.lru_cache(maxsize=DATE_CACHE_SIZE)(
+            lambda text: datetime.strptime(text, self.date_format))
+
+    def number(self, filename):
+        match = self.number_re.search(filename)
+        return match.group() if match else None
+
+    def date(self, filename):
+        match = self.date_re.search(filename)
+        if match:
+            return self._parse_date(match.group(1))
+        return None
+
+    def category(self, filename):
+        """Return the ORDER index of the first keyword in a filename, or len(order)."""
+        name = filename.lower()
+        for index, keyword in enumerate(self._keywords):
+            if keyword in name:
+                return index
+        return len(self._keywords)
+
+    def classify(self, filename):
+        """Parse a filename into a FileRecord, or None if it has no 9-digit number."""
+        number = self.number(filename)
+        if number is None:
+            return None
+        return FileRecord(number, self.category(filename), self.date(filename))
+
+    def fingerprint(self):
+        """Hash of the rules, used to invalidate anything derived from them."""
+        ident = json.dumps([self.order, self.number_pattern, self.date_pattern, self.date_format])
+        return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+def load_rules(config_path=CONFIG_PATH):
+    """Build FilenameRules, overriding the defaults from a JSON file if present.
+
+    Recognised keys: "order", "number_pattern", "date_pattern", "date_format".
+    """
+    config = {}
+    if config_path and os.path.exists(config_path):
+        with open(config_path) as f:
+            config = json.load(f)
+    return FilenameRules(
+        order=config.get("order", DEFAULT_ORDER),
+        number_pattern=config.get("number_pattern", DEFAULT_NUMBER_PATTERN),
+        date_pattern=config.get("date_pattern", DEFAULT_DATE_PATTERN),
+        date_format=config.get("date_format", DEFAULT_DATE_FORMAT),
+    )
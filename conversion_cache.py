@@ -0,0 +1,81 @@
+# Local cache of image-to-PDF conversions.
+#
+# Entries are keyed by the source's path, size and mtime together with the
+# conversion parameters, so an unchanged image is never decoded twice. The
+# cache is trimmed to a byte budget, evicting least recently used entries.
+
+import hashlib
+import os
+import threading
+import uuid
+
+# ----------------- CONFIG -----------------
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".document_merge", "converted")
+MAX_CACHE_BYTES = 2 * 1024 ** 3  # 2 GB
+
+
+# ----------------- CACHE -----------------
+
+class ConversionCache:
+    """Content-addressed store of converted PDFs with size-based LRU eviction."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_key(self, source_path, params):
+        """Hash the source identity (path, size, mtime) and the conversion parameters."""
+        stat = os.stat(source_path)
+        ident = f"{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime_ns}|{params}"
+        return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+    def get_or_convert(self, source_path, convert, params):
+        """Return the cached PDF for source_path, running convert(source, output) on a miss."""
+        cached_path = os.path.join(self.cache_dir, self.cache_key(source_path, params) + ".pdf")
+        if os.path.exists(cached_path):
+            os.utime(cached_path)  # mark as recently used
+            with self._lock:
+                self.hits += 1
+            return cached_path
+
+        # Convert to a private temp name first so readers never see a partial file.
+        tmp_path = f"{cached_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            convert(source_path, tmp_path)
+            os.replace(tmp_path, cached_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            self.misses += 1
+        return cached_path
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        """Return hit/miss counters for the run summary."""
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,129 @@
+# Duplicate document detection within an account.
+#
+# The same statement often sits in several subfolders. Files are compared by
+# content hash (only when sizes collide, so unique files are never read
+# twice). Optionally each page is also reduced to a perceptual hash (the low
+# frequencies of a DCT of a 32x32 thumbnail, as in pHash) plus a hash of its
+# text layer, so a re-saved or re-scanned copy of an earlier document is
+# caught as well: every page must match the same page of one earlier document.
+#
+# The perceptual hash tolerates the shift, blur and noise of a re-scan, but
+# not a different layout. It cannot tell apart two statements that share a
+# layout and differ only in their figures, so pages that both have text must
+# also have equal text, and documents whose filenames carry different
+# statement dates are never matched. Two scanned (text-less) statements with
+# the same layout and no dates can still be taken for copies. fitz and PIL
+# are only imported for page hashing.
+
+import hashlib
+import math
+import os
+
+# ----------------- CONFIG -----------------
+
+HASH_CHUNK_SIZE = 1024 * 1024
+PAGE_HASH_DPI = 72
+PAGE_HASH_SIZE = 32  # pages are reduced to 32x32 grayscale thumbnails...
+PAGE_HASH_FREQUENCIES = 8  # ...of which the lowest 8x8 DCT frequencies are kept (63 bits without DC)
+# Differing bits still counted as the same page. Simulated re-scans (up to a
+# 6 px shift, 0.7 degree skew, blur and noise) differ by 0-4 bits; different
+# page layouts by 24 or more.
+PAGE_HASH_MAX_DISTANCE = 10
+
+
+# ----------------- HASHES -----------------
+
+def file_digest(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _dct_basis(size=PAGE_HASH_SIZE, frequencies=PAGE_HASH_FREQUENCIES):
+    return [[math.cos(math.pi * u * (2 * x + 1) / (2 * size)) for x in range(size)] for u in range(frequencies)]
+
+
+_DCT_BASIS = _dct_basis()
+
+
+def perceptual_hash(img):
+    """pHash of a PIL image: one bit per low DCT frequency above the median."""
+    from PIL import Image
+    size, frequencies = PAGE_HASH_SIZE, PAGE_HASH_FREQUENCIES
+    pixels = img.convert("L").resize((size, size), Image.LANCZOS).tobytes()
+    # Separable 2-D DCT, computing only the frequencies that are kept
+    rows = [[sum(pixels[y * size + x] * basis[x] for x in range(size)) for basis in _DCT_BASIS]
+            for y in range(size)]
+    coefficients = [sum(rows[y][u] * _DCT_BASIS[v][y] for y in range(size))
+                    for v in range(frequencies) for u in range(frequencies)][1:]  # drop DC
+    median = sorted(coefficients)[len(coefficients) // 2]
+    return sum(1 << i for i, c in enumerate(coefficients) if c > median)
+
+
+def hash_distance(a, b):
+    """Number of differing bits between two perceptual hashes."""
+    return bin(a ^ b).count("1")
+
+
+def page_hashes(path):
+    """Return one (text digest or None, perceptual hash) pair per page of a PDF or image."""
+    import fitz
+    from PIL import Image
+    hashes = []
+    with fitz.open(path) as doc:
+        for page in doc:
+            text = " ".join(page.get_text().split())
+            pix = page.get_pixmap(dpi=PAGE_HASH_DPI, colorspace=fitz.csGRAY)
+            hashes.append((hashlib.sha256(text.encode("utf-8")).hexdigest() if text else None,
+                           perceptual_hash(Image.frombytes("L", (pix.width, pix.height), pix.samples))))
+    return hashes
+
+
+def same_pages(hashes, other):
+    """True if both documents have the same pages: similar images, equal text where both have text."""
+    return len(hashes) == len(other) and all(
+        (text is None or other_text is None or text == other_text)
+        and hash_distance(image, other_image) <= PAGE_HASH_MAX_DISTANCE
+        for (text, image), (other_text, other_image) in zip(hashes, other)
+    )
+
+
+# ----------------- DEDUPLICATION -----------------
+
+def drop_duplicates(documents, compare_pages=False):
+    """Drop repeated documents, keeping the first copy in merge order.
+
+    documents are (path, record, name) tuples. Returns (kept, dropped_count).
+    """
+    sizes = {doc[0]: os.path.getsize(doc[0]) for doc in documents}
+    size_counts = {}
+    for size in sizes.values():
+        size_counts[size] = size_counts.get(size, 0) + 1
+
+    seen_digests = set()
+    seen_pages = []
+    kept = []
+    for doc in documents:
+        if size_counts[sizes[doc[0]]] > 1:
+            digest = file_digest(doc[0])
+            if digest in seen_digests:
+                continue
+            seen_digests.add(digest)
+
+        if compare_pages:
+            try:
+                hashes = page_hashes(doc[0])
+            except Exception:
+                hashes = []  # unreadable; left for the merge to report
+            date = doc[1].date
+            if hashes and any(same_pages(hashes, other) for other_date, other in seen_pages
+                              if not (date and other_date and date != other_date)):
+                continue
+            if hashes:
+                seen_pages.append((date, hashes))
+
+        kept.append(doc)
+    return kept, len(documents) - len(kept)
@@ -0,0 +1,157 @@
+# Concurrent directory traversal for high-latency network shares.
+#
+# os.walk lists one directory at a time, so every listing costs a full
+# network round trip before the next one starts. parallel_walk() lists
+# directories on a bounded thread pool, ahead of the consumer, while still
+# yielding the same (root, dirs, files) triples in the same order as os.walk.
+# walk_tree() is the same traversal with a caller-supplied listing function,
+# used by the scan index to revalidate directories on the pool.
+
+import heapq
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------- CONFIG -----------------
+
+WALK_WORKERS = 16
+# Listings queued or finished ahead of the consumer; bounds memory on large trees.
+MAX_PENDING_LISTINGS = WALK_WORKERS * 16
+
+
+def _list_dir(path):
+    """List one directory as (dirs, symlinked dirs, files), or None if unreadable."""
+    dirs, files, links = [], [], set()
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                # DirEntry caches the type from the listing itself, so no stat
+                # call is made per entry (except for symlinks).
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    dirs.append(entry.name)
+                    if entry.is_symlink():
+                        links.add(entry.name)
+                else:
+                    files.append(entry.name)
+    except OSError:
+        return None
+    return dirs, links, files
+
+
+def parallel_walk(top, max_workers=WALK_WORKERS, prune=None):
+    """Yield (root, dirs, files) exactly like os.walk(top) with topdown=True.
+
+    Every listed directory immediately queues its subdirectories on the pool,
+    so listings run ahead of the consumer. As with os.walk, the caller may
+    remove names from dirs to skip them; prune(root, dirname) drops a
+    subdirectory before it is listed or yielded. Symlinked directories are
+    reported but not followed.
+    """
+    for root, dirs, (_, _, files) in walk_tree(top, _list_dir, max_workers, prune):
+        yield root, dirs, files
+
+
+def walk_tree(top, list_dir, max_workers=WALK_WORKERS, prune=None, max_pending=MAX_PENDING_LISTINGS):
+    """Yield (root, dirs, listing) in parallel_walk() order.
+
+    list_dir(path) runs on the pool and returns None for an unreadable
+    directory, or a listing tuple starting with its subdirectory names and
+    the set of those that are not followed. dirs and prune work as in
+    parallel_walk(). At most max_pending listings are queued or held ahead
+    of the consumer; further subdirectories wait as paths until it catches up.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {}  # listings submitted ahead of the consumer, not yet consumed
+    scheduled = set()
+    # Discovered paths not yet submitted, as a heap of (walk position, path):
+    # the position is the sibling index at each level, so the heap yields
+    # paths in the order the consumer will reach them.
+    waiting = []
+    queued = {}  # path -> walk position, for the paths in waiting
+    lock = threading.Lock()
+
+    def subdirs(root, listing):
+        dirs, links = listing[:2]
+        if prune:
+            dirs = [name for name in dirs if not prune(root, name)]
+        return dirs, [name for name in dirs if name not in links]
+
+    def listed(root, position, future):
+        if future.cancelled() or future.exception() is not None:
+            return  # the consumer re-raises the error when it reaches root
+        listing = future.result()
+        if listing is None:
+            return
+        with lock:
+            for index, name in enumerate(subdirs(root, listing)[1]):
+                path = os.path.join(root, name)
+                if path not in scheduled:
+                    scheduled.add(path)
+                    queued[path] = position + (index,)
+                    heapq.heappush(waiting, (queued[path], path))
+        submit_waiting()
+
+    def submit_waiting():
+        submitted = []
+        with lock:
+            while waiting and len(futures) < max_pending:
+                position, path = heapq.heappop(waiting)
+                if queued.pop(path, None) is None:
+                    continue  # listed by the consumer or forgotten
+                try:
+                    future = futures[path] = executor.submit(list_dir, path)
+                except RuntimeError:
+                    return  # the walk was closed early
+                submitted.append((path, position, future))
+        # Outside the lock: an already finished future runs the callback here.
+        for path, position, future in submitted:
+            future.add_done_callback(lambda f, path=path, position=position: listed(path, position, f))
+
+    def forget(path):
+        """Drop prefetched work under a directory the caller removed from dirs."""
+        prefix = path + os.sep
+        with lock:
+            for other in [p for p in futures if p == path or p.startswith(prefix)]:
+                futures.pop(other).cancel()
+            for other in [p for p in queued if p == path or p.startswith(prefix)]:
+                del queued[other]
+
+    try:
+        stack = [(top, ())]
+        scheduled.add(top)
+        while stack:
+            root, position = stack.pop()
+            with lock:
+                future = futures.pop(root, None)
+                listed_here = future is None
+                if listed_here:
+                    # Not prefetched yet: list it now, outside the window.
+                    queued.pop(root, None)
+                    future = executor.submit(list_dir, root)
+            if listed_here:
+                future.add_done_callback(lambda f, root=root, position=position: listed(root, position, f))
+            submit_waiting()
+            listing = future.result()
+            if listing is None:
+                continue
+            all_dirs, followed = subdirs(root, listing)
+            dirs = list(all_dirs)
+
+            yield root, dirs, listing
+
+            for name in set(all_dirs) - set(dirs):
+                forget(os.path.join(root, name))
+            # Positions match the ones listed() gives the same subdirectories.
+            for index in reversed(range(len(followed))):
+                if followed[index] not in dirs:
+                    continue
+                path = os.path.join(root, followed[index])
+                stack.append((path, position + (index,)))
+                with lock:
+                    scheduled.add(path)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
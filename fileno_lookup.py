@@ -0,0 +1,167 @@
+# FORW_REFNO -> FILENO lookup.
+#
+# Numbers are resolved in chunks that stay below SQL Server's ~2,100
+# parameter limit over a single reused connection. Results are kept in a
+# local SQLite cache for FILENO_CACHE_TTL seconds so recently resolved
+# numbers are not queried again.
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------- CONFIG -----------------
+
+MASTER_TABLE = "CLSMI.dbo.MASTER"
+FILENO_CHUNK_SIZE = 1000
+# Accounts discovered before their FILENOs are looked up together (unfiltered runs).
+FILENO_BATCH_SIZE = 200
+FILENO_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".document_merge", "fileno_cache.sqlite")
+FILENO_CACHE_TTL = 7 * 24 * 60 * 60  # one week
+
+
+# ----------------- CACHE -----------------
+
+class FilenoCache:
+    """Persistent FORW_REFNO -> FILENO map with a time-to-live."""
+
+    def __init__(self, cache_path=FILENO_CACHE_PATH, ttl=FILENO_CACHE_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fileno "
+                "(forw_refno TEXT PRIMARY KEY, fileno TEXT NOT NULL, fetched REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # A short-lived connection per call keeps the cache usable from any thread.
+        return sqlite3.connect(self.cache_path)
+
+    def get_many(self, numbers):
+        """Return cached entries for numbers that have not expired."""
+        found = {}
+        numbers = list(numbers)
+        cutoff = time.time() - self.ttl
+        with self._connect() as conn:
+            for start in range(0, len(numbers), FILENO_CHUNK_SIZE):
+                chunk = numbers[start:start + FILENO_CHUNK_SIZE]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT forw_refno, fileno FROM fileno "
+                    f"WHERE fetched >= ? AND forw_refno IN ({placeholders})",
+                    [cutoff] + chunk,
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, fileno_map):
+        """Store freshly resolved entries."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fileno (forw_refno, fileno, fetched) VALUES (?, ?, ?)",
+                [(number, fileno, now) for number, fileno in fileno_map.items()],
+            )
+
+
+# ----------------- LOOKUP -----------------
+
+class FilenoResolver:
+    """Resolve 9-digit numbers to FILENO over one reused database connection.
+
+    connect is any DB-API connection factory using '?' parameters, so a
+    SQLite database with a MASTER table can stand in for SQL Server.
+    """
+
+    def __init__(self, connect, table=MASTER_TABLE, cache=None, chunk_size=FILENO_CHUNK_SIZE):
+        self.connect = connect
+        self.table = table
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.conn = None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, unique_numbers):
+        """Map 9-digit numbers to 6-digit FILENO, using the cache where possible."""
+        numbers = sorted(set(unique_numbers))
+        if not numbers:
+            return {}
+
+        fileno_map = self.cache.get_many(numbers) if self.cache else {}
+        missing = [n for n in numbers if n not in fileno_map]
+        if not missing:
+            return fileno_map
+
+        if self.conn is None:
+            self.conn = self.connect()
+        fetched = {}
+        cursor = self.conn.cursor()
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start:start + self.chunk_size]
+            placeholders = ",".join("?" for _ in chunk)
+            cursor.execute(
+                f"SELECT FORW_REFNO, FILENO FROM {self.table} WHERE FORW_REFNO IN ({placeholders})",
+                chunk,
+            )
+            for forw_refno, fileno in cursor.fetchall():
+                fetched[str(forw_refno)] = str(fileno)
+
+        if self.cache and fetched:
+            self.cache.put_many(fetched)
+        fileno_map.update(fetched)
+        return fileno_map
+
+
+class BatchedLookup:
+    """Resolve numbers in batches on a background thread as accounts are discovered.
+
+    add() queues a number and submits a lookup every batch_size numbers;
+    get() waits for a number's batch, submitting a partial batch if needed.
+    All lookups run on the one thread, so lookup may hold a connection.
+    """
+
+    def __init__(self, lookup, batch_size=FILENO_BATCH_SIZE):
+        self.lookup = lookup
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._batch = []
+        self._futures = {}
+
+    def _submit(self):
+        batch, self._batch = self._batch, []
+        future = self._executor.submit(self.lookup, batch)
+        for number in batch:
+            self._futures[number] = future
+
+    def add(self, unique_number):
+        with self._lock:
+            self._batch.append(unique_number)
+            if len(self._batch) >= self.batch_size:
+                self._submit()
+
+    def get(self, unique_number):
+        """Return the FILENO for a number, or None if it has none."""
+        with self._lock:
+            if unique_number not in self._futures:
+                if unique_number not in self._batch:
+                    self._batch.append(unique_number)
+                self._submit()
+            future = self._futures.pop(unique_number)
+        return future.result().get(unique_number)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
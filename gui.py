@@ -18,10 +18,10 @@ import os
 import queue
 import threading
 import subprocess
+import multiprocessing
 import customtkinter as ctk
 from PIL import Image
 from tkinter import filedialog
-from main import main
 
 # ----------------- DummyStream Fix for PyInstaller console=False -----------------
 class DummyStream:
@@ -37,6 +37,10 @@ if sys.stdout is None:
 program_name = "Rsg Doc remerge"
 instructions_path = r'P:\Users\Justin\Program Shortcuts\Docs\PDF\RSG Document Merger.pdf'
 input_type = "folder"  # "file", "files", "ofn", "folder"
+worker_count = 1  # Processes used to merge accounts; 1 = serial
+output_profile = "fast"  # "fast" or "compact" (smaller merged PDFs)
+force_rebuild = False  # True re-merges accounts that are already up to date
+stream_by_folder = True  # False waits for the whole scan before merging
 
 # ----------------- Resource Path Helper -----------------
 def resource_path(relative_path):
@@ -188,6 +192,8 @@ class GUI:
         try:
             while True:
                 value = self.progress_queue.get_nowait()
+                if isinstance(value, dict):
+                    continue  # instrumentation event, not a progress value
                 self.progress_bar.set(value)
         except queue.Empty:
             pass
@@ -245,24 +251,25 @@ class GUI:
         input_value = self.input_entry.get()
         txt_value = self.txt_entry.get()
         output_folder = self.output_folder_entry.get()
-        if not output_folder or (not input_value and not txt_value):
+        if not output_folder or not input_value:
             self.set_processing_status("Missing parameters.")
             return
 
-        # Prioritize TXT input if provided
+        unique_numbers = []
         if txt_value:
-            input_value = [num.strip() for num in txt_value.split(",")]
-        elif input_type in ["ofn","files"]:
-            input_value = [num.strip() for num in input_value.replace("|",",").split(",")]
+            unique_numbers = [num.strip() for num in txt_value.split(",") if num.strip()]
 
-        threading.Thread(target=self.main_threaded, args=(input_value, output_folder)).start()
+        threading.Thread(target=self.main_threaded, args=(input_value, output_folder, unique_numbers)).start()
         self.submit_button.configure(state="disabled")
         self.set_processing_status("Processing...")
 
-    def main_threaded(self, input_value, output_folder):
+    def main_threaded(self, input_folder, output_folder, unique_numbers):
         try:
             self.progress_bar.set(0)
-            main(input_value, output_folder, self.progress_queue)
+            from main import main  # imported on first use so the window appears sooner
+            main(input_folder, output_folder, unique_numbers, self.progress_queue,
+                 workers=worker_count, profile_name=output_profile, force=force_rebuild,
+                 stream_by_folder=stream_by_folder)
             self.set_processing_status("Processing complete.")
         except Exception as e:
             print("Error during processing:", e)
@@ -272,6 +279,7 @@ class GUI:
 
 # ----------------- Main -----------------
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Required for worker processes in the PyInstaller build
     root = ctk.CTk()
     app = GUI(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,107 @@
+# Run instrumentation: timing spans and counters per stage and per account.
+#
+# Every span and counter is pushed onto the progress queue as a dict event
+# (progress values stay plain floats) and collected into a run profile that
+# is written as JSON and CSV next to merge_results.xlsx.
+
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import progress_callback
+
+# ----------------- CONFIG -----------------
+
+PROFILE_NAME = "merge_profile"
+
+
+# ----------------- PROFILE -----------------
+
+class RunProfile:
+    """Collect timing spans and counters for one run."""
+
+    def __init__(self, progress_queue=None):
+        self.progress_queue = progress_queue
+        self.started = time.time()
+        self.spans = []
+        self.counters = {}
+        self.peak_rss = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, event):
+        progress_callback(self.progress_queue, event)
+
+    def record(self, stage, seconds, account=None):
+        """Add a span that was timed elsewhere, e.g. in a worker process."""
+        span = {"type": "span", "stage": stage, "account": account, "seconds": round(seconds, 6)}
+        with self._lock:
+            self.spans.append(span)
+        self._emit(span)
+
+    @contextmanager
+    def span(self, stage, account=None):
+        """Time the enclosed block as one span of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, account)
+
+    def count(self, name, value=1, account=None):
+        """Add value to a run-wide counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self._emit({"type": "counter", "name": name, "account": account, "value": value})
+
+    def timed_iter(self, stage, iterator):
+        """Yield from iterator, recording the time spent producing items as one span."""
+        elapsed = 0.0
+        start = time.perf_counter()
+        for item in iterator:
+            elapsed += time.perf_counter() - start
+            yield item
+            start = time.perf_counter()
+        elapsed += time.perf_counter() - start
+        self.record(stage, elapsed)
+
+    def add_merge_stats(self, unique_number, stats):
+        """Fold the timings and counters returned by merge_documents() into the profile."""
+        for stage, seconds in stats.get("timings", {}).items():
+            self.record(stage, seconds, unique_number)
+        for name in ("files", "duplicates", "pages", "input_bytes", "output_bytes", "plain_bytes",
+                     "cache_hits", "cache_misses"):
+            if stats.get(name):
+                self.count(name, stats[name], unique_number)
+        if stats.get("peak_rss"):
+            with self._lock:
+                self.peak_rss[unique_number] = stats["peak_rss"]
+            self._emit({"type": "peak_rss", "account": unique_number, "value": stats["peak_rss"]})
+
+    def summary(self):
+        """Return total seconds per stage."""
+        totals = {}
+        for span in self.spans:
+            totals[span["stage"]] = totals.get(span["stage"], 0.0) + span["seconds"]
+        return totals
+
+    def write(self, output_folder, suffix=""):
+        """Write the run profile as JSON and CSV."""
+        base = os.path.join(output_folder, PROFILE_NAME + suffix)
+        with open(base + ".json", "w") as f:
+            json.dump({
+                "started": self.started,
+                "elapsed": time.time() - self.started,
+                "stages": self.summary(),
+                "counters": self.counters,
+                "peak_rss": self.peak_rss,
+                "spans": self.spans,
+            }, f, indent=2)
+
+        with open(base + ".csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "account", "seconds"])
+            for span in self.spans:
+                writer.writerow([span["stage"], span["account"] or "", span["seconds"]])
@@ -0,0 +1,100 @@
+# Run journal for resumable batches.
+#
+# Each completed account is appended to merge_journal.jsonl in the output
+# folder together with a fingerprint of its inputs, its output paths and
+# its report metrics. A rerun skips accounts whose fingerprint is unchanged
+# and whose output is still newer than every input, make-style, and a
+# rebuilt account replaces the output recorded for it.
+
+import hashlib
+import json
+import os
+
+# ----------------- CONFIG -----------------
+
+JOURNAL_NAME = "merge_journal"
+# merge_documents() stats kept so skipped accounts can still be reported
+JOURNALED_STATS = ("files", "duplicates", "pages", "output_bytes")
+
+
+def input_fingerprint(documents, *settings):
+    """Hash the paths, sizes and mtimes of an account's inputs plus run settings.
+
+    Returns (fingerprint, newest input mtime).
+    """
+    digest = hashlib.sha1()
+    newest = 0.0
+    for path in sorted(d[0] for d in documents):
+        stat = os.stat(path)
+        newest = max(newest, stat.st_mtime)
+        digest.update(f"{path}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    for setting in settings:
+        digest.update(f"{setting}\n".encode("utf-8"))
+    return digest.hexdigest(), newest
+
+
+# ----------------- JOURNAL -----------------
+
+class RunJournal:
+    """Append-only record of completed accounts in an output folder."""
+
+    def __init__(self, output_folder, force=False, suffix=""):
+        self.path = os.path.join(output_folder, f"{JOURNAL_NAME}{suffix}.jsonl")
+        self.force = force
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # partial line from an interrupted run
+                    self.entries[entry["number"]] = entry
+        self._file = open(self.path, "a")
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def up_to_date(self, unique_number, fingerprint, newest_input):
+        """Return the recorded output path if the account needs no rebuild, else None."""
+        entry = self.entries.get(unique_number)
+        if self.force or not entry or entry["fingerprint"] != fingerprint:
+            return None
+        output_path = entry["output"]
+        try:
+            if os.path.getmtime(output_path) < newest_input:
+                return None
+        except OSError:
+            return None
+        return output_path
+
+    def outputs(self, unique_number):
+        """Return the output paths (volumes) recorded for an account, or []."""
+        entry = self.entries.get(unique_number)
+        if not entry:
+            return []
+        return entry.get("outputs") or [entry["output"]]
+
+    def stats(self, unique_number):
+        """Return the report metrics recorded for an account, or {}."""
+        entry = self.entries.get(unique_number)
+        return dict(entry.get("stats", {})) if entry else {}
+
+    def record(self, unique_number, fingerprint, outputs, stats=None):
+        """Mark an account as completed with its output paths and merge stats."""
+        entry = {
+            "number": unique_number,
+            "fingerprint": fingerprint,
+            "output": outputs[0],
+            "outputs": outputs,
+            "stats": {name: stats[name] for name in JOURNALED_STATS if name in (stats or {})},
+        }
+        self.entries[unique_number] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
@@ -1,36 +1,115 @@
+import argparse
+import io
 import os
-import re
-import fitz
-import openpyxl
-from PIL import Image
-from reportlab.pdfgen import canvas
+import queue
+import threading
+import time
+import zlib
+import cProfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 import shelve
-import pyodbc
 from utils import progress_callback
+from scan_index import ScanIndex, default_index_path
+from conversion_cache import ConversionCache
+from fileno_lookup import BatchedLookup, FilenoCache, FilenoResolver
+from instrumentation import RunProfile
+from classify import load_rules
+from journal import RunJournal, input_fingerprint
+from dedupe import drop_duplicates
+from report import ResultsReport, combine_shard_results
+from fastwalk import WALK_WORKERS, parallel_walk
+from output_writer import OutputWriter, is_copy_of
+
+# fitz, PIL, reportlab, pyodbc and psutil are imported inside the functions
+# that use them, so importing this module (e.g. to show the GUI) stays fast.
 
 # ----------------- CONFIG -----------------
 
-ORDER = [
-    "Terms",
-    "Supplemental Borrower",
-    "Bill Statement - CHARGE OFF",
-    "Bill Statement",
-    "Pay History",
-    "Sales Memo",
-    "GOODBYE",
-    "OwnershipChain",
-    "DataString",
-]
+# ORDER keywords and filename patterns; override them in classification.json.
+RULES = load_rules()
+ORDER = RULES.order
 
 SKIPPED_EXTENSIONS = ('.eml', '.htm', '.xlsx')
 VALID_EXTENSIONS = ('.pdf', '.tif', '.tiff', '.jpg', '.jpeg')
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+# Number of processes used to merge accounts. 1 keeps the original serial run.
+DEFAULT_WORKERS = 1
+# Number of threads converting images to PDF once the merge set is known.
+CONVERT_WORKERS = 4
+# Keep a persistent scan index so reruns only relist changed directories.
+USE_SCAN_INDEX = True
+# Store converted images in the local conversion cache instead of next to the source.
+USE_CONVERSION_CACHE = True
+TIFF_RESOLUTION = 100.0
+# Place images straight onto merged pages from memory instead of converting
+# them to intermediate PDFs first. JPEG data is embedded without recompression
+# and bilevel TIFFs are stored CCITT G4 compressed, via the conversion cache.
+INGEST_IMAGES_IN_MEMORY = True
+# Start merging an account as soon as its top-level folder has been walked.
+# An account found again in a later top-level folder is merged again at the
+# end of the walk, replacing its first output.
+STREAM_BY_FOLDER = True
+# Directories listed concurrently while walking the input tree.
+SCAN_WORKERS = WALK_WORKERS
+# With a number list, skip folders named exactly like a 9-digit number that
+# is not on the list (per-account folders) without listing them.
+PRUNE_ACCOUNT_FOLDERS = True
+# Accounts buffered between pipeline stages.
+PIPELINE_QUEUE_SIZE = 16
+# How often a blocked pipeline stage checks whether its consumer has stopped.
+STAGE_POLL_SECONDS = 0.1
+
+# Output profiles: options passed to fitz save(), font subsetting and image
+# downsampling. Bilevel (fax-style) images are ingested CCITT G4 compressed
+# (see insert_bilevel_page()) and never rewritten, so that compression is
+# kept by every profile.
+OUTPUT_PROFILES = {
+    "fast": {
+        "save": {},
+        "subset_fonts": False,
+        "image_dpi": None,
+    },
+    "compact": {
+        "save": {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True,
+                 "use_objstms": 1},
+        "subset_fonts": True,
+        "image_dpi": 150,
+    },
+}
+DEFAULT_PROFILE = "fast"
+# save() options that are also valid for incremental saves of later segments.
+INCREMENTAL_SAVE_OPTIONS = ("deflate", "deflate_images", "deflate_fonts")
+
+# Memory-bounded merging. When an account has this many pages (or source
+# bytes) in memory, they are written out and later pages are appended with
+# incremental saves. None disables the budget.
+MERGE_SEGMENT_PAGES = None
+MERGE_SEGMENT_BYTES = None
+# Split a merged account into numbered volumes past this many pages.
+MERGE_VOLUME_PAGES = None
+# Besides identical files, also drop documents whose pages all look like
+# pages already in the account (catches re-scans; renders every page).
+DEDUPE_PAGES = False
+# Also serialize each account without the output profile, to report what the
+# profile saved. Costs one extra in-memory save per account or segment.
+MEASURE_SAVINGS = False
+# merge_documents() options that only affect reporting, not the output, so
+# they are left out of the journal fingerprint.
+REPORTING_MERGE_OPTIONS = ("measure_savings",)
+# Line-oriented copy of the results report, flushed per account so a run can
+# be tailed: "csv", "jsonl" or None.
+RESULTS_SINK = "csv"
 
 
 # ----------------- SQL -----------------
 
 def get_db_connection():
     """Connect to SQL Server using saved credentials."""
+    import pyodbc
     with shelve.open(r'P:/Users/Justin/Projects/sql_creds/credentials') as db:
         server = db['server']
         database = db['database']
@@ -51,72 +130,137 @@ def fetch_fileno_map(unique_numbers):
     if not unique_numbers:
         return {}
 
-    placeholders = ",".join("?" for _ in unique_numbers)
-    query = f"""
-        SELECT FORW_REFNO, FILENO
-        FROM CLSMI.dbo.MASTER
-        WHERE FORW_REFNO IN ({placeholders})
-    """
-    fileno_map = {}
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(query, list(unique_numbers))
-        for forw_refno, fileno in cursor.fetchall():
-            fileno_map[str(forw_refno)] = str(fileno)
-    return fileno_map
+    with FilenoResolver(get_db_connection, cache=FilenoCache()) as resolver:
+        return resolver.lookup(unique_numbers)
 
 
 # ----------------- UTILITIES -----------------
 
 def get_unique_number(filename):
     """Extract 9-digit number from filename."""
-    match = re.search(r'\d{9}', filename)
-    return match.group() if match else None
+    return RULES.number(filename)
 
 
 def extract_date(filename):
     """Extract date from filename formatted as 'Stm. Date - mm_dd_yyyy'."""
-    match = re.search(r'Stm\. Date - (\d{1,2}_\d{1,2}_\d{4})', filename)
-    if match:
-        return datetime.strptime(match.group(1), '%m_%d_%Y')
-    return None
+    return RULES.date(filename)
 
 
 def get_sort_key(filename):
     """Determine sort priority based on ORDER list."""
-    name = filename.lower()
-    for index, keyword in enumerate(ORDER):
-        if keyword.lower() in name:
-            return index
-    return len(ORDER)
+    return RULES.category(filename)
 
 
-def convert_image_to_pdf(image_path):
+def convert_image_to_pdf(image_path, output_path=None):
     """Convert JPG/JPEG to PDF."""
+    from PIL import Image
+    from reportlab.pdfgen import canvas
     img = Image.open(image_path)
     if img.width > img.height:
         img = img.rotate(90, expand=True)
 
-    output_path = os.path.splitext(image_path)[0] + "_converted.pdf"
+    output_path = output_path or os.path.splitext(image_path)[0] + "_converted.pdf"
     c = canvas.Canvas(output_path, pagesize=img.size)
     c.drawImage(image_path, 0, 0, width=img.size[0], height=img.size[1])
     c.save()
     return output_path
 
 
-def convert_tif_to_pdf(tif_path):
+def convert_tif_to_pdf(tif_path, output_path=None):
     """Convert TIFF/TIF to PDF."""
+    from PIL import Image
     img = Image.open(tif_path)
     if img.width > img.height:
         img = img.rotate(90, expand=True)
 
-    output_path = os.path.splitext(tif_path)[0] + "_converted.pdf"
-    img.save(output_path, "PDF", resolution=100.0)
+    output_path = output_path or os.path.splitext(tif_path)[0] + "_converted.pdf"
+    img.save(output_path, "PDF", resolution=TIFF_RESOLUTION)
     return output_path
 
 
+def conversion_params(file_path):
+    """Describe how a file is converted; part of the conversion cache key."""
+    lower = file_path.lower()
+    if lower.endswith(TIFF_EXTENSIONS):
+        return f"tif:resolution={TIFF_RESOLUTION}:rotate-landscape"
+    if lower.endswith(JPEG_EXTENSIONS):
+        return "jpg:reportlab:rotate-landscape"
+    return None
+
+
+def convert_to_pdf(file_path, output_path=None):
+    """Convert an image to PDF; PDFs are returned unchanged."""
+    lower = file_path.lower()
+    if lower.endswith(TIFF_EXTENSIONS):
+        return convert_tif_to_pdf(file_path, output_path)
+    if lower.endswith(JPEG_EXTENSIONS):
+        return convert_image_to_pdf(file_path, output_path)
+    return file_path
+
+
+def is_image(file_path):
+    """Return True for TIFF/JPEG sources."""
+    return file_path.lower().endswith(TIFF_EXTENSIONS + JPEG_EXTENSIONS)
+
+
+def insert_image_page(merged_pdf, image_path, cache=None):
+    """Add an image as a new page of merged_pdf, reading it into memory once.
+
+    Bilevel TIFFs are re-encoded as CCITT G4, through the ConversionCache
+    when one is given, so an unchanged fax page is only decoded once.
+    """
+    from PIL import Image
+    is_tiff = image_path.lower().endswith(TIFF_EXTENSIONS)
+    if is_tiff and cache is not None:
+        # PIL only parses the header here; the pixels are never decoded.
+        with Image.open(image_path) as img:
+            bilevel = img.mode == "1"
+        if bilevel:
+            import fitz
+            cached_path = cache.get_or_convert(image_path, convert_tif_to_pdf, conversion_params(image_path))
+            with fitz.open(cached_path) as page_pdf:
+                merged_pdf.insert_pdf(page_pdf)
+            return
+
+    with open(image_path, "rb") as f:
+        data = f.read()
+
+    # PIL only parses the header here; the pixels are never decoded.
+    with Image.open(io.BytesIO(data)) as img:
+        if is_tiff and img.mode == "1":
+            insert_bilevel_page(merged_pdf, img)
+            return
+        width, height = img.size
+    scale = 72.0 / TIFF_RESOLUTION if is_tiff else 1.0
+    width, height = width * scale, height * scale
+
+    rotate = 0
+    if width > height:
+        width, height = height, width
+        rotate = 90
+
+    page = merged_pdf.new_page(width=width, height=height)
+    page.insert_image(page.rect, stream=data, rotate=rotate)
+
+
+def insert_bilevel_page(merged_pdf, img):
+    """Add a bilevel (fax-style) scan as a page, keeping it CCITT G4 compressed.
+
+    insert_image() would store the bitmap uncompressed, so the page is built
+    as a one-page PDF in memory, the same way convert_tif_to_pdf() does.
+    """
+    import fitz
+    if img.width > img.height:
+        img = img.rotate(90, expand=True)
+    buffer = io.BytesIO()
+    img.save(buffer, "PDF", resolution=TIFF_RESOLUTION)
+    with fitz.open("pdf", buffer.getvalue()) as page_pdf:
+        merged_pdf.insert_pdf(page_pdf)
+
+
 def check_pdf_integrity(path):
     """Verify PDF can be opened."""
+    import fitz
     try:
         with fitz.open(path) as doc:
             doc.load_page(0)
@@ -125,132 +269,925 @@ def check_pdf_integrity(path):
         return False
 
 
-def safe_rename(src, dest):
-    """Rename file without overwriting."""
-    if os.path.exists(dest):
-        base, ext = os.path.splitext(dest)
-        counter = 1
-        while True:
-            new_dest = f"{base}_{counter}{ext}"
-            if not os.path.exists(new_dest):
-                dest = new_dest
-                break
-            counter += 1
-    os.rename(src, dest)
+def read_numbers_file(path):
+    """Read 9-digit numbers from a TXT file, one per line."""
+    with open(path, "r") as f:
+        lines = [line.strip() for line in f]
+    return [line for line in lines if line.isdigit() and len(line) == 9]
+
 
+def parse_shard(value):
+    """Parse 'i/N' (1-based) into (index, count)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard must look like i/N, e.g. 2/4")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("shard i/N needs 1 <= i <= N")
+    return index, count
 
-def write_results_excel(results, output_folder):
-    """Write merge results to Excel."""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.append(["rsg number", "merged"])
-    for unique_number, merged in results:
-        ws.append([unique_number, "x" if merged else ""])
-    wb.save(os.path.join(output_folder, "merge_results.xlsx"))
+
+def in_shard(unique_number, shard):
+    """Deterministically assign a number to one of N shards."""
+    if not shard:
+        return True
+    index, count = shard
+    return zlib.crc32(unique_number.encode("utf-8")) % count == index - 1
+
+
+def shard_suffix(shard):
+    """File name suffix that keeps each shard's result files apart."""
+    return f".shard-{shard[0]}-of-{shard[1]}" if shard else ""
 
 
 # ----------------- FILE SCANNING -----------------
 
-def scan_files(input_folder, filter_numbers=None):
-    """Recursively scan folder and convert images/TIFFs to PDF."""
-    pdf_dict = {}
-    for root, _, files in os.walk(input_folder):
-        for file in files:
-            if file.lower().endswith(SKIPPED_EXTENSIONS):
-                continue
-            if not file.lower().endswith(VALID_EXTENSIONS):
-                continue
+def is_candidate(filename):
+    """Return True if the file type can be merged."""
+    name = filename.lower()
+    if name.endswith(SKIPPED_EXTENSIONS):
+        return False
+    return name.endswith(VALID_EXTENSIONS)
 
-            unique_number = get_unique_number(file)
-            if not unique_number:
-                continue
-            if filter_numbers and unique_number not in filter_numbers:
+
+def classify_filename(filename):
+    """Parse a filename once into a FileRecord (number, category, date), or None."""
+    return RULES.classify(filename)
+
+
+def account_folder_pruner(filter_numbers):
+    """Return a parallel_walk prune callback for a number list, or None."""
+    if not filter_numbers or not PRUNE_ACCOUNT_FOLDERS:
+        return None
+
+    def prune(root, name):
+        return RULES.number_re.fullmatch(name) is not None and name not in filter_numbers
+    return prune
+
+
+def walk_input(input_folder, filter_numbers=None):
+    """Walk the input tree like os.walk, listing directories concurrently."""
+    return parallel_walk(input_folder, SCAN_WORKERS, account_folder_pruner(filter_numbers))
+
+
+def parse_directory(root, files):
+    """Return [(unique_number, (path, record, name)), ...] for a directory's candidate files."""
+    documents = []
+    for file in files:
+        if not is_candidate(file):
+            continue
+        record = classify_filename(file)
+        if record:
+            documents.append((record.number, (os.path.join(root, file), record, file)))
+    return documents
+
+
+def iter_directories(input_folder, filter_numbers=None, index=None):
+    """Yield (root, [(unique_number, (path, record, name)), ...]) per directory in walk order.
+
+    With a ScanIndex, the tree is revalidated against the index instead of
+    every filename being parsed again. Either way directories are listed on
+    the concurrent walker's pool and account folders outside filter_numbers
+    are pruned.
+    """
+    if index is not None:
+        directories = index.walk(input_folder, is_candidate, classify_filename,
+                                 SCAN_WORKERS, account_folder_pruner(filter_numbers))
+    else:
+        directories = ((root, parse_directory(root, files))
+                       for root, _, files in walk_input(input_folder, filter_numbers))
+    for root, documents in directories:
+        if filter_numbers:
+            documents = [doc for doc in documents if doc[0] in filter_numbers]
+        yield root, documents
+
+
+def scan_files(input_folder, filter_numbers=None, index_path=None):
+    """Recursively scan folder and record candidate documents per 9-digit number.
+
+    With index_path, the tree is revalidated against a persistent ScanIndex
+    instead of being walked and parsed from scratch.
+    """
+    return dict(discover_accounts(input_folder, filter_numbers, index_path, group_by_folder=False))
+
+
+def top_folder(input_folder, root):
+    """Return the top-level folder of input_folder that root lies in (None for input_folder)."""
+    rel = os.path.relpath(root, input_folder)
+    return None if rel == os.curdir else rel.split(os.sep)[0]
+
+
+def discover_accounts(input_folder, filter_numbers=None, index_path=None,
+                      group_by_folder=STREAM_BY_FOLDER):
+    """Yield (unique_number, documents) as soon as each account is complete.
+
+    With group_by_folder, accounts are released whenever the walk leaves a
+    top-level folder; otherwise they are released once the scan finishes.
+    Only the scan index, not a dict of the whole tree, is held in memory
+    when index_path is given.
+    """
+    if not index_path:
+        yield from _discover_accounts(input_folder, filter_numbers, None, group_by_folder)
+        return
+    with ScanIndex(index_path, RULES.fingerprint()) as index:
+        yield from _discover_accounts(input_folder, filter_numbers, index, group_by_folder)
+
+
+def _discover_accounts(input_folder, filter_numbers, index, group_by_folder):
+    directories = iter_directories(input_folder, filter_numbers, index)
+    if group_by_folder:
+        yield from _stream_by_folder(input_folder, index, directories)
+    elif index is not None:
+        for _ in directories:
+            pass
+        yield from index.iter_accounts(filter_numbers)
+    else:
+        pdf_dict = {}
+        for _, documents in directories:
+            for unique_number, doc in documents:
+                pdf_dict.setdefault(unique_number, []).append(doc)
+        yield from pdf_dict.items()
+
+
+def _stream_by_folder(input_folder, index, directories):
+    """Release accounts per top-level folder (see discover_accounts()).
+
+    An account the index still knows under a folder not walked yet is held
+    until that folder is done. One that turns up again after its release
+    (new files in another folder) is released a second time at the end of
+    the walk with all of its documents, and the earlier merge is replaced.
+    """
+    root_docs = {}
+    pending = {}
+    held = {}
+    released = {}  # number -> top-level folders of its released documents
+    spanning = set()
+    walked = set()
+    current_top = None
+
+    def elsewhere(unique_number):
+        if index is None:
+            return False
+        tops = {top_folder(input_folder, d) for d in index.account_dirs(unique_number)}
+        return bool(tops - walked - {None})
+
+    def release(accounts, wait=True):
+        for unique_number, documents in accounts.items():
+            if unique_number in held:
+                documents = held.pop(unique_number) + documents
+            if wait and elsewhere(unique_number):
+                held[unique_number] = documents
                 continue
+            released[unique_number] = {top_folder(input_folder, os.path.dirname(d[0])) for d in documents}
+            yield unique_number, documents + root_docs.get(unique_number, [])
 
-            file_path = os.path.join(root, file)
-            if file.lower().endswith(('.tif', '.tiff')):
-                file_path = convert_tif_to_pdf(file_path)
-            elif file.lower().endswith(('.jpg', '.jpeg')):
-                file_path = convert_image_to_pdf(file_path)
+    for root, documents in directories:
+        top = top_folder(input_folder, root)
+        if top != current_top:
+            walked.add(current_top)
+            yield from release(pending)
+            yield from release({n: [] for n in list(held)})
+            pending = {}
+            current_top = top
+
+        for unique_number, doc in documents:
+            if top is None:
+                root_docs.setdefault(unique_number, []).append(doc)
+            elif unique_number in released:
+                spanning.add(unique_number)
+                released[unique_number].add(top)
+            else:
+                pending.setdefault(unique_number, []).append(doc)
+
+    walked.add(current_top)
+    yield from release(pending)
+    yield from release({n: [] for n in list(held)}, wait=False)
+    # Accounts found only directly in input_folder
+    for unique_number, documents in root_docs.items():
+        if unique_number not in released:
+            yield unique_number, documents
+
+    if not spanning:
+        return
+    print(f"Warning: {len(spanning)} account(s) span several top-level folders; merging them again.")
+    if index is not None:
+        yield from index.iter_accounts(spanning)
+        return
+    rescanned = {}
+    for top in set().union(*(released[n] for n in spanning)) - {None}:
+        for _, documents in iter_directories(os.path.join(input_folder, top), spanning):
+            for unique_number, doc in documents:
+                rescanned.setdefault(unique_number, []).append(doc)
+    for unique_number in sorted(spanning):
+        yield unique_number, rescanned.get(unique_number, []) + root_docs.get(unique_number, [])
 
-            pdf_dict.setdefault(unique_number, []).append(
-                (file_path, extract_date(file), file)
-            )
+
+def convert_pending_images(pdf_dict, max_workers=CONVERT_WORKERS, cache=None):
+    """Convert images that will be merged to PDF on a bounded thread pool."""
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for unique_number, documents in pdf_dict.items():
+            for index, (path, record, _) in enumerate(documents):
+                if record.category >= len(ORDER):
+                    continue  # merge_documents() drops it anyway
+                if not is_image(path):
+                    continue
+                if cache:
+                    future = executor.submit(cache.get_or_convert, path, convert_to_pdf, conversion_params(path))
+                else:
+                    future = executor.submit(convert_to_pdf, path)
+                pending[(unique_number, index)] = future
+
+    for (unique_number, index), future in pending.items():
+        _, record, name = pdf_dict[unique_number][index]
+        pdf_dict[unique_number][index] = (future.result(), record, name)
     return pdf_dict
 
 
 # ----------------- MERGING -----------------
 
-def merge_documents(unique_number, documents, output_folder):
-    """Merge PDFs for a single 9-digit number."""
-    # Filter and sort
-    documents = [d for d in documents if get_sort_key(d[2]) < len(ORDER)]
-    documents.sort(key=lambda x: x[1] or datetime.min, reverse=True)
-    documents.sort(key=lambda x: get_sort_key(x[2]))
+def optimize_output(merged_pdf, profile):
+    """Apply a profile's font subsetting and image downsampling before saving."""
+    if profile["subset_fonts"]:
+        merged_pdf.subset_fonts()
+    if profile["image_dpi"]:
+        merged_pdf.rewrite_images(
+            dpi_threshold=profile["image_dpi"] + 10,
+            dpi_target=profile["image_dpi"],
+            bitonal=False,
+        )
+
+
+def is_plain_profile(profile):
+    """Return True if a profile saves the merged document as-is."""
+    return not (profile["save"] or profile["subset_fonts"] or profile["image_dpi"])
+
+
+def current_rss():
+    """Return this process's resident set size in bytes, or None if unknown."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass  # fall back to /proc where available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MergedOutput:
+    """Merged document for one account, written in segments and volumes to bound memory.
+
+    Without budgets this is a single in-memory document saved once with the
+    output profile. With a segment budget, each segment is built as its own
+    in-memory document, optimized with the profile and then written: the
+    first one saved with the profile, later ones appended with incremental
+    saves that keep its deflate options (garbage collection and object
+    streams only apply to the first save). With a volume
+    limit, sources that would overflow the current volume start a new
+    {unique_number}_volN.pdf file. With measure_savings, plain_bytes is what
+    saving without the profile would have written (appended segments count
+    at their own size); otherwise it is only tracked for plain profiles.
+    """
+
+    def __init__(self, output_folder, unique_number, profile,
+                 segment_pages=None, segment_bytes=None, volume_pages=None, measure_savings=False):
+        self.output_folder = output_folder
+        self.unique_number = unique_number
+        self.profile = profile
+        self.measure_savings = measure_savings
+        self.segment_pages = segment_pages
+        self.segment_bytes = segment_bytes
+        self.volume_pages = volume_pages
+        self.paths = []
+        self.page_count = 0
+        self.plain_bytes = 0
+        self.peak_rss = current_rss()
+        self._new_volume()
+
+    def _new_volume(self):
+        import fitz
+        number = len(self.paths) + 1
+        self.paths.append(os.path.join(self.output_folder, output_name(self.unique_number, None, number)))
+        self.doc = fitz.open()
+        self.on_disk = False
+        self.volume_page_count = 0
+        self.pages_in_memory = 0
+        self.bytes_in_memory = 0
+
+    def _flush(self):
+        """Write the segment held in memory to the current volume and start a new one."""
+        import fitz
+        if not self.pages_in_memory:
+            return
+        path = self.paths[-1]
+        plain = is_plain_profile(self.profile)
+        if not plain:
+            if self.measure_savings:
+                # What a plain save would have written, to report the profile's savings
+                self.plain_bytes += len(self.doc.tobytes())
+            optimize_output(self.doc, self.profile)
+        if self.on_disk:
+            # Append the optimized segment. Incremental saves cannot collect
+            # garbage, but keep the profile's compression options.
+            options = {key: value for key, value in self.profile["save"].items() if key in INCREMENTAL_SAVE_OPTIONS}
+            size = os.path.getsize(path)
+            with fitz.open(path) as volume:
+                volume.insert_pdf(self.doc)
+                volume.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP, **options)
+            if plain:
+                self.plain_bytes += os.path.getsize(path) - size
+        else:
+            self.doc.save(path, **self.profile["save"])
+            if plain:
+                self.plain_bytes += os.path.getsize(path)
+        self.doc.close()
+        self.doc = fitz.open()
+        self.on_disk = True
+        self.pages_in_memory = 0
+        self.bytes_in_memory = 0
+
+    def sample_rss(self):
+        rss = current_rss()
+        if rss and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def before_source(self, page_count):
+        """Start a new volume if the next source would overflow the current one."""
+        if (self.volume_pages and self.volume_page_count
+                and self.volume_page_count + page_count > self.volume_pages):
+            self._flush()
+            self.doc.close()
+            self._new_volume()
+
+    def after_source(self, page_count, source_bytes):
+        """Account for an inserted source and flush if a budget is reached."""
+        self.page_count += page_count
+        self.volume_page_count += page_count
+        self.pages_in_memory += page_count
+        self.bytes_in_memory += source_bytes
+        self.sample_rss()
+        if ((self.segment_pages and self.pages_in_memory >= self.segment_pages)
+                or (self.segment_bytes and self.bytes_in_memory >= self.segment_bytes)):
+            self._flush()
+
+    def finish(self):
+        """Write the remaining pages and return the volume paths."""
+        self._flush()
+        self.sample_rss()
+        self.doc.close()
+        return self.paths
+
+    def discard(self):
+        """Drop the account, removing anything already written."""
+        self.doc.close()
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
 
-    # Check integrity
-    for path, _, _ in documents:
-        if not check_pdf_integrity(path):
-            return False, None
 
-    output_path = os.path.join(output_folder, f"{unique_number}.pdf")
+def merge_documents(unique_number, documents, output_folder, profile_name=DEFAULT_PROFILE,
+                    segment_pages=MERGE_SEGMENT_PAGES, segment_bytes=MERGE_SEGMENT_BYTES,
+                    volume_pages=MERGE_VOLUME_PAGES, dedupe_pages=DEDUPE_PAGES,
+                    measure_savings=MEASURE_SAVINGS):
+    """Merge PDFs for a single 9-digit number.
 
-    with fitz.open() as merged_pdf:
-        for path, _, _ in documents:
+    Each source is opened once and validated as it is inserted. Returns
+    (merged, output_path, error, stats); on failure nothing is kept and
+    error names the offending file. Duplicate copies are dropped first.
+    stats holds file, duplicate, page and byte counts, volume paths, peak
+    RSS and per-stage timings, since this may run in a worker process.
+    """
+    import fitz
+    profile = OUTPUT_PROFILES[profile_name]
+    # Filter and sort on the FileRecord parsed at scan time: by ORDER, newest first
+    documents = [d for d in documents if d[1].category < len(ORDER)]
+    documents.sort(key=lambda d: d[1].date or datetime.min, reverse=True)
+    documents.sort(key=lambda d: d[1].category)
+
+    # Drop duplicate copies before anything is validated or inserted
+    start = time.perf_counter()
+    try:
+        documents, duplicates = drop_duplicates(documents, dedupe_pages)
+    except OSError as e:
+        return False, None, f"{os.path.basename(e.filename or '')}: {e.strerror}", {"timings": {}}
+    dedupe_time = time.perf_counter() - start
+
+    stats = {
+        "files": len(documents),
+        "duplicates": duplicates,
+        "pages": 0,
+        "input_bytes": 0,
+        "output_bytes": 0,
+        "plain_bytes": 0,
+        "volumes": [],
+        "peak_rss": None,
+        "timings": {"dedupe": dedupe_time},
+    }
+
+    cache = None
+    if USE_CONVERSION_CACHE and any(d[0].lower().endswith(TIFF_EXTENSIONS) for d in documents):
+        cache = ConversionCache()
+
+    output = MergedOutput(output_folder, unique_number, profile, segment_pages, segment_bytes, volume_pages,
+                          measure_savings)
+    start = time.perf_counter()
+    for path, _, name in documents:
+        try:
+            source_bytes = os.path.getsize(path)
+            stats["input_bytes"] += source_bytes
+            if is_image(path):
+                output.before_source(1)
+                insert_image_page(output.doc, path, cache)
+                output.after_source(1, source_bytes)
+                continue
             with fitz.open(path) as src_pdf:
+                src_pdf.load_page(0)  # integrity check
+                output.before_source(src_pdf.page_count)
                 for page in src_pdf:
                     if page.rotation == 0 and page.rect.width > page.rect.height:
                         page.set_rotation(90)
-                merged_pdf.insert_pdf(src_pdf)
-        if merged_pdf.page_count == 0:
-            return False, None
-        merged_pdf.save(output_path)
+                output.doc.insert_pdf(src_pdf)
+                output.after_source(src_pdf.page_count, source_bytes)
+        except Exception as e:
+            # Roll back the whole account, including segments already written.
+            output.discard()
+            stats["timings"]["insert"] = time.perf_counter() - start
+            return False, None, f"{name}: {e}", stats
+    stats["timings"]["insert"] = time.perf_counter() - start
+
+    if output.page_count == 0:
+        output.discard()
+        return False, None, "no documents to merge", stats
+    stats["pages"] = output.page_count
+
+    start = time.perf_counter()
+    stats["volumes"] = output.finish()
+    stats["timings"]["save"] = time.perf_counter() - start
+    stats["peak_rss"] = output.peak_rss
+    stats["output_bytes"] = sum(os.path.getsize(path) for path in stats["volumes"])
+    stats["plain_bytes"] = output.plain_bytes
+    if cache:
+        stats["cache_hits"], stats["cache_misses"] = cache.hits, cache.misses
+    return True, stats["volumes"][0], None, stats
+
+
+# ----------------- PIPELINE -----------------
 
-    return True, output_path
+_STAGE_DONE = object()
+
+
+def run_stage(items, maxsize=PIPELINE_QUEUE_SIZE):
+    """Drain an iterator on a background thread through a bounded queue.
+
+    When the consumer stops early (closes the generator or raises), the
+    producer stops too and closes items, so the stages before it (and the
+    scan index they hold open) are released before this returns.
+    """
+    stage_queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                stage_queue.put(item, timeout=STAGE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+        put(_STAGE_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = stage_queue.get()
+            if item is _STAGE_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def convert_accounts(accounts, cache=None, run_profile=None):
+    """Convert each account's images to PDF as it passes through the pipeline."""
+    for unique_number, documents in accounts:
+        start = time.perf_counter()
+        convert_pending_images({unique_number: documents}, cache=cache)
+        if run_profile:
+            run_profile.record("convert", time.perf_counter() - start, unique_number)
+        yield unique_number, documents
+
+
+def iter_merges(accounts, output_folder, workers=DEFAULT_WORKERS, profile_name=DEFAULT_PROFILE,
+                up_to_date=None, merge_options=None):
+    """Yield (unique_number, documents, merged, output_path, error, stats) in input order.
+
+    up_to_date(unique_number, documents) may return an existing output path,
+    in which case the account is reported as merged without being rebuilt.
+    merge_options are extra keyword arguments for merge_documents().
+    """
+    merge_options = merge_options or {}
+
+    def skipped(unique_number, documents):
+        existing = up_to_date(unique_number, documents) if up_to_date else None
+        if existing:
+            return True, existing, None, {"up_to_date": True}
+        return None
+
+    if workers <= 1:
+        for unique_number, documents in accounts:
+            result = skipped(unique_number, documents) or merge_documents(
+                unique_number, documents, output_folder, profile_name, **merge_options)
+            yield (unique_number, documents) + result
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # A bounded, ordered window of futures keeps memory flat and results
+        # in the same order as the serial run.
+        in_flight = deque()
+        for unique_number, documents in accounts:
+            result = skipped(unique_number, documents)
+            if result is None:
+                result = executor.submit(merge_documents, unique_number, documents, output_folder,
+                                         profile_name, **merge_options)
+            in_flight.append((unique_number, documents, result))
+            if len(in_flight) >= workers * 2:
+                unique_number, documents, result = in_flight.popleft()
+                yield (unique_number, documents) + (result if isinstance(result, tuple) else result.result())
+        while in_flight:
+            unique_number, documents, result = in_flight.popleft()
+            yield (unique_number, documents) + (result if isinstance(result, tuple) else result.result())
 
 
 # ----------------- MAIN -----------------
 
-def main(input_folder, output_folder, unique_numbers_list, progress_queue=None):
-    """Scan input folder, filter by user 9-digit numbers, merge, rename, and save results."""
-    # Scan recursively and filter
-    pdf_dict = scan_files(input_folder, set(unique_numbers_list))
-    if not pdf_dict:
-        print("No matching documents found.")
+def main(input_folder, output_folder, unique_numbers_list, progress_queue=None,
+         workers=DEFAULT_WORKERS, use_index=USE_SCAN_INDEX, profile_name=DEFAULT_PROFILE,
+         cprofile=False, force=False, shard=None, open_output=True, merge_options=None,
+         results_sink=RESULTS_SINK, replace_outputs=False, update_report=False,
+         stream_by_folder=STREAM_BY_FOLDER):
+    """Scan input folder, filter by user 9-digit numbers, merge, rename, and save results.
+
+    Stages run as a streaming pipeline (discover -> convert -> merge ->
+    write -> report). With stream_by_folder, an account starts merging once
+    its top-level folder has been walked; otherwise once the scan finishes.
+    Merges are saved to local staging and copied to the output folder by a
+    background writer under names reserved from one listing of the folder.
+    Completed accounts are journaled in the output folder; a rerun skips
+    those whose inputs are unchanged unless force is set. shard=(i, N) only
+    processes the accounts in shard i of N and suffixes the result, journal
+    and profile files so several machines can share an output folder.
+    merge_options (segment_pages, segment_bytes, volume_pages) bound the
+    memory used per account. Timings and counters are written to
+    merge_profile.json/.csv, including peak RSS per account. Result rows are
+    appended to merge_results.xlsx (and the results_sink file) as each
+    account completes. replace_outputs overwrites an account's existing
+    '{fileno}-doc seq.pdf' instead of adding a _N copy, and update_report
+    keeps rows from an earlier report (both used by watch mode). With
+    cprofile, the main thread is also captured to merge_profile.prof.
+    """
+    profiler = cProfile.Profile() if cprofile else None
+    if profiler:
+        profiler.enable()
+    try:
+        run(input_folder, output_folder, unique_numbers_list, progress_queue,
+            workers, use_index, profile_name, force, shard, merge_options, results_sink,
+            replace_outputs, update_report, stream_by_folder)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(output_folder, f"merge_profile{shard_suffix(shard)}.prof"))
+
+    if open_output:
+        try:
+            os.startfile(output_folder)
+        except Exception:
+            pass
+
+
+def run(input_folder, output_folder, unique_numbers_list, progress_queue,
+        workers, use_index, profile_name, force, shard, merge_options, results_sink,
+        replace_outputs, update_report, stream_by_folder):
+    """Run the pipeline for main()."""
+    filter_numbers = {n for n in unique_numbers_list if in_shard(n, shard)}
+    if unique_numbers_list and not filter_numbers:
+        print("No numbers fall in this shard.")
         return
+    run_profile = RunProfile(progress_queue)
+
+    with RunJournal(output_folder, force, shard_suffix(shard)) as journal:
+        run_pipeline(input_folder, output_folder, filter_numbers, progress_queue,
+                     workers, use_index, profile_name, run_profile, journal, shard, merge_options,
+                     results_sink, replace_outputs, update_report, stream_by_folder)
+
+
+def output_name(unique_number, fileno, volume=1):
+    """Final name of an account's output volume: '{fileno}-doc seq.pdf', or '{unique_number}.pdf' without a FILENO."""
+    if not fileno:
+        return f"{unique_number}.pdf" if volume == 1 else f"{unique_number}_vol{volume}.pdf"
+    return f"{fileno}-doc seq.pdf" if volume == 1 else f"{fileno}-doc seq_vol{volume}.pdf"
+
+
+def result_row(unique_number, fileno, documents, merged, error, stats):
+    """Build a results report row (see report.COLUMNS).
+
+    Accounts skipped as up to date are marked as such in the merged column.
+    """
+    used = stats.get("files")
+    duplicates = stats.get("duplicates", 0)
+    skipped = len(documents) - used - duplicates if used is not None else None
+    seconds = round(sum(stats.get("timings", {}).values()), 3)
+    if stats.get("up_to_date"):
+        status = "up to date"
+    else:
+        status = "x" if merged else ""
+    return [unique_number, fileno, status, used, skipped, duplicates,
+            stats.get("pages"), stats.get("output_bytes"), seconds, error]
+
+
+def run_pipeline(input_folder, output_folder, filter_numbers, progress_queue,
+                 workers, use_index, profile_name, run_profile, journal, shard, merge_options,
+                 results_sink, replace_outputs, update_report, stream_by_folder):
+    """Discover, merge, write and report, journaling each completed account."""
+    # number -> input fingerprints in merge order (an account can be merged
+    # twice in a run; see discover_accounts())
+    fingerprints = {}
+    released = set()
+
+    def up_to_date(unique_number, documents):
+        try:
+            fingerprint, newest = input_fingerprint(
+                documents, RULES.fingerprint(), profile_name,
+                sorted(item for item in (merge_options or {}).items() if item[0] not in REPORTING_MERGE_OPTIONS))
+        except OSError:
+            fingerprint = None
+        fingerprints.setdefault(unique_number, deque()).append(fingerprint)
+        # A second release replaces a partial first one that was just rebuilt,
+        # so it is never skipped, even if the journal matches its full set.
+        again = unique_number in released
+        released.add(unique_number)
+        if fingerprint is None or again:
+            return None
+        return journal.up_to_date(unique_number, fingerprint, newest)
+
+    def lookup_filenos(numbers):
+        with run_profile.span("sql"):
+            return fetch_fileno_map(numbers)
+
+    def previous_outputs(unique_number):
+        """Earlier outputs of an account in this output folder, replaced by a rebuild."""
+        paths = outputs.pop(unique_number, None) or journal.outputs(unique_number)
+        folder = os.path.normcase(os.path.abspath(output_folder))
+        return [path for path in paths if os.path.normcase(os.path.dirname(os.path.abspath(path))) == folder]
+
+    # Resolve FILENOs in the background while scanning and merging: all at
+    # once for a number list, otherwise in batches as accounts are discovered.
+    fileno_future = None
+    resolver = None
+    filenos = None
+    if filter_numbers:
+        lookup_executor = ThreadPoolExecutor(max_workers=1)
+        fileno_future = lookup_executor.submit(lookup_filenos, filter_numbers)
+        lookup_executor.shutdown(wait=False)
+    else:
+        resolver = FilenoResolver(get_db_connection, cache=FilenoCache())
+
+        def resolve_batch(numbers):
+            with run_profile.span("sql"):
+                return resolver.lookup(numbers)
+        filenos = BatchedLookup(resolve_batch)
+
+    def announce(accounts):
+        for account in accounts:
+            filenos.add(account[0])
+            yield account
+
+    index_path = default_index_path(input_folder) if use_index else None
+    accounts = discover_accounts(input_folder, filter_numbers, index_path, stream_by_folder)
+    if shard and not filter_numbers:
+        accounts = (account for account in accounts if in_shard(account[0], shard))
+    accounts = run_stage(run_profile.timed_iter("scan", accounts if filenos is None else announce(accounts)))
 
-    total_documents = sum(len(docs) for docs in pdf_dict.values()) or 1
-    processed = 0
-    merge_results = []
+    # In-memory ingestion only converts bilevel TIFFs, through the same cache
+    # (see merge_documents()); its hits and misses come back in the merge stats.
+    cache = ConversionCache() if USE_CONVERSION_CACHE else None
+    if not INGEST_IMAGES_IN_MEMORY:
+        accounts = run_stage(convert_accounts(accounts, cache, run_profile))
 
-    fileno_map = fetch_fileno_map(pdf_dict.keys())
+    report = None
+    completed = 0
+    input_bytes = output_bytes = plain_bytes = 0
 
-    for unique_number, documents in pdf_dict.items():
-        merged, output_path = merge_documents(unique_number, documents, output_folder)
-        if merged:
-            merge_results.append((unique_number, True))
-            fileno = fileno_map.get(unique_number)
-            if fileno:
-                new_name = os.path.join(output_folder, f"{fileno}-doc seq.pdf")
-                safe_rename(output_path, new_name)
+    def finish(unique_number, fileno, documents, merged, error, stats, write):
+        """Journal and report one account once its output is on the share."""
+        nonlocal report, completed, input_bytes, output_bytes, plain_bytes
+        if write is not None:
+            try:
+                outputs[unique_number] = write.result()
+            except OSError as e:
+                merged, error = False, f"Write failed: {e}"
+        if unique_number not in reported:
+            reported.add(unique_number)
+            completed += 1
+        fingerprint = fingerprints[unique_number].popleft()
+        if not fingerprints[unique_number]:
+            del fingerprints[unique_number]
+
+        if stats.get("up_to_date"):
+            run_profile.count("up_to_date", account=unique_number)
+            stats = dict(journal.stats(unique_number), **stats)
+        elif merged:
+            input_bytes += stats["input_bytes"]
+            output_bytes += stats["output_bytes"]
+            plain_bytes += stats["plain_bytes"]
+            if fingerprint:
+                journal.record(unique_number, fingerprint, outputs[unique_number], stats)
         else:
-            merge_results.append((unique_number, False))
+            run_profile.count("failed_accounts", account=unique_number)
+            print(f"Merge failed for {unique_number}: {error}")
 
-        processed += len(documents)
-        progress_callback(progress_queue, min(processed / total_documents, 1.0))
+        with run_profile.span("report", unique_number):
+            if report is None:
+                report = ResultsReport(output_folder, shard_suffix(shard), results_sink, update_report)
+            report.append(result_row(unique_number, fileno, documents, merged, error, stats))
 
-    write_results_excel(merge_results, output_folder)
+        # The total is only known up front when a number list is given.
+        if filter_numbers:
+            progress_callback(progress_queue, min(completed / len(filter_numbers), 1.0))
 
+    # Merges are saved to local staging and copied to the share in the
+    # background; accounts are reported in order as their writes finish.
+    writer = OutputWriter(output_folder, replace_outputs, run_profile=run_profile)
+    pending = deque()
+    reported = set()
+    outputs = {}  # number -> output paths written in this run
+    merges = iter_merges(accounts, writer.staging_folder, workers, profile_name, up_to_date, merge_options)
     try:
-        os.startfile(output_folder)
-    except Exception:
-        pass
+        for unique_number, documents, merged, output_path, error, stats in merges:
+            if fileno_future is not None:
+                fileno = fileno_future.result().get(unique_number)
+            else:
+                fileno = filenos.get(unique_number)
+
+            if stats.get("up_to_date") and not is_copy_of(output_path, output_name(unique_number, fileno)):
+                # Unchanged inputs, but the output was named for another FILENO
+                # (or none): rebuild it under the current name.
+                merged, output_path, error, stats = merge_documents(
+                    unique_number, documents, writer.staging_folder, profile_name, **(merge_options or {}))
+
+            run_profile.count("accounts", account=unique_number)
+            run_profile.count("files_discovered", len(documents), unique_number)
+            run_profile.add_merge_stats(unique_number, stats)
+
+            write = None
+            if merged and not stats.get("up_to_date"):
+                moves = [(path, output_name(unique_number, fileno, volume))
+                         for volume, path in enumerate(stats["volumes"], start=1)]
+                # A rebuilt account replaces its journaled output, make-style. One
+                # merged again in this run (see discover_accounts()) waits until
+                # its earlier output has been written.
+                while any(item[0] == unique_number for item in pending):
+                    finish(*pending.popleft())
+                # '{unique_number}.pdf' outputs are overwritten, as before.
+                write = writer.submit(unique_number, moves, replace=not fileno,
+                                      previous=previous_outputs(unique_number))
+            pending.append((unique_number, fileno, documents, merged, error, stats, write))
+
+            while pending and (pending[0][-1] is None or pending[0][-1].done()):
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        # Stop the scan and convert stages too if the run failed part-way.
+        merges.close()
+        accounts.close()
+        writer.close()
+        if filenos:
+            filenos.close()
+        if resolver:
+            resolver.close()
+        if report is not None:
+            # Also runs after a crash, keeping the rows written so far.
+            with run_profile.span("report"):
+                report.close()
+
+    if report is None:
+        print("No matching documents found.")
+        return
+    progress_callback(progress_queue, 1.0)
+
+    if plain_bytes:
+        saved = plain_bytes - output_bytes
+        print(f"Output profile '{profile_name}': {input_bytes} bytes in, {output_bytes} bytes out; "
+              f"the profile saved {saved} bytes ({saved / plain_bytes:.0%}) against a plain save.")
+    else:
+        # Savings are only measured with measure_savings (see MergedOutput).
+        print(f"Output profile '{profile_name}': {input_bytes} bytes in, {output_bytes} bytes out.")
+
+    if cache:
+        evicted = cache.evict()
+        stats = cache.stats()
+        hits = stats["hits"] + run_profile.counters.get("cache_hits", 0)
+        misses = stats["misses"] + run_profile.counters.get("cache_misses", 0)
+        print(f"Conversion cache: {hits} hits, {misses} misses, {evicted} evicted.")
+    if run_profile.peak_rss:
+        print(f"Peak RSS per account: up to {max(run_profile.peak_rss.values()) / 1024 ** 2:.0f} MB.")
+    run_profile.write(output_folder, shard_suffix(shard))
 
 
 # ----------------- ENTRY -----------------
 
+def build_parser():
+    """Command-line interface for headless and sharded runs."""
+    parser = argparse.ArgumentParser(description="Merge account documents by 9-digit number.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = commands.add_parser("run", help="Scan, merge and report.")
+    run_cmd.add_argument("--input", required=True, help="Input folder to scan recursively.")
+    run_cmd.add_argument("--output", required=True, help="Output folder for merged PDFs and results.")
+    run_cmd.add_argument("--numbers", help="TXT file of 9-digit numbers; omit to merge every account found.")
+    run_cmd.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Merge processes.")
+    run_cmd.add_argument("--profile", choices=sorted(OUTPUT_PROFILES), default=DEFAULT_PROFILE,
+                         help="Output size profile.")
+    run_cmd.add_argument("--segment-pages", type=int, default=MERGE_SEGMENT_PAGES,
+                         help="Write merged pages to disk every N pages to bound memory.")
+    run_cmd.add_argument("--segment-mb", type=int, help="Write merged pages to disk every N MB of sources.")
+    run_cmd.add_argument("--volume-pages", type=int, default=MERGE_VOLUME_PAGES,
+                         help="Split accounts into numbered volumes past N pages.")
+    run_cmd.add_argument("--dedupe-pages", action="store_true",
+                         help="Also drop documents whose every page matches the same page of an earlier document.")
+    run_cmd.add_argument("--measure-savings", action="store_true",
+                         help="Report what the output profile saved against a plain save (one extra save per account).")
+    run_cmd.add_argument("--results-sink", choices=["csv", "jsonl", "none"], default=RESULTS_SINK or "none",
+                         help="Line-oriented results file written as accounts complete.")
+    run_cmd.add_argument("--shard", type=parse_shard, help="Process only shard i of N, e.g. 2/4.")
+    run_cmd.add_argument("--force", action="store_true", help="Rebuild accounts that are up to date.")
+    run_cmd.add_argument("--no-index", action="store_true", help="Walk the input tree without the scan index.")
+    run_cmd.add_argument("--no-stream", action="store_true",
+                         help="Start merging only after the whole input tree has been scanned.")
+    run_cmd.add_argument("--cprofile", action="store_true", help="Write a cProfile capture.")
+
+    watch_cmd = commands.add_parser("watch", help="Re-merge accounts as documents arrive.")
+    watch_cmd.add_argument("--input", required=True, help="Input folder to watch recursively.")
+    watch_cmd.add_argument("--output", required=True, help="Output folder for merged PDFs and results.")
+    watch_cmd.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Merge processes.")
+    watch_cmd.add_argument("--profile", choices=sorted(OUTPUT_PROFILES), default=DEFAULT_PROFILE,
+                           help="Output size profile.")
+    watch_cmd.add_argument("--debounce", type=float, default=10.0,
+                           help="Seconds without new arrivals before re-merging.")
+    watch_cmd.add_argument("--poll", action="store_true",
+                           help="Poll instead of using native events (needed for network shares).")
+    watch_cmd.add_argument("--interval", type=float, default=30.0, help="Polling interval in seconds.")
+
+    combine_cmd = commands.add_parser("combine", help="Combine per-shard results into merge_results.xlsx.")
+    combine_cmd.add_argument("output", help="Output folder holding merge_results.shard-*.xlsx files.")
+    return parser
+
+
+def cli(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "combine":
+        count = combine_shard_results(args.output)
+        print(f"Combined {count} shard result files.")
+        return
+    if args.command == "watch":
+        from watch import watch
+        watch(args.input, args.output, debounce=args.debounce, poll=args.poll, interval=args.interval,
+              workers=args.workers, profile_name=args.profile)
+        return
+
+    numbers = read_numbers_file(args.numbers) if args.numbers else []
+    merge_options = {
+        "segment_pages": args.segment_pages,
+        "segment_bytes": args.segment_mb * 1024 ** 2 if args.segment_mb else MERGE_SEGMENT_BYTES,
+        "volume_pages": args.volume_pages,
+        "dedupe_pages": args.dedupe_pages,
+        "measure_savings": args.measure_savings,
+    }
+    main(args.input, args.output, numbers, workers=args.workers, use_index=not args.no_index,
+         profile_name=args.profile, cprofile=args.cprofile, force=args.force, shard=args.shard,
+         open_output=False, merge_options=merge_options,
+         results_sink=None if args.results_sink == "none" else args.results_sink,
+         stream_by_folder=not args.no_stream)
+
+
 if __name__ == "__main__":
-    input_folder = r"P:\Users\Steven Cox\Projects\test folders\Rsg Doc merger\In"
-    output_folder = r"P:\Users\Steven Cox\Projects\test folders\Rsg Doc merger\Out"
-    user_numbers = ["123456789", "987654321"]  # Example 9-digit numbers
-    main(input_folder, output_folder, user_numbers)
+    cli()
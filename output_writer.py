@@ -0,0 +1,157 @@
+# Background output writer.
+#
+# Merged PDFs are saved to local staging storage and copied to the output
+# folder on a small thread pool, so merging never waits on the network share.
+# Final names are reserved in memory from a single listing of the output
+# folder instead of probing the share for a free "_N" name, and every file is
+# copied under a temporary name and renamed into place, so a partially
+# written PDF never appears under its final name.
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------- CONFIG -----------------
+
+STAGING_DIR = os.path.join(tempfile.gettempdir(), "document_merge_staging")
+OUTPUT_WRITERS = 4
+PARTIAL_SUFFIX = ".partial"
+
+
+# ----------------- NAMES -----------------
+
+class OutputNames:
+    """Collision-free output names, reserved from one directory listing."""
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self._lock = threading.Lock()
+        with os.scandir(output_folder) as entries:
+            self._taken = {os.path.normcase(entry.name) for entry in entries}
+
+    def reserve(self, name):
+        """Return a free path for name, adding _1, _2... if it is taken."""
+        base, ext = os.path.splitext(name)
+        candidate = name
+        counter = 0
+        with self._lock:
+            while os.path.normcase(candidate) in self._taken:
+                counter += 1
+                candidate = f"{base}_{counter}{ext}"
+            self._taken.add(os.path.normcase(candidate))
+        return os.path.join(self.output_folder, candidate)
+
+
+def is_copy_of(path, name):
+    """Return True if path is named name, or name with a _N suffix."""
+    base, ext = os.path.splitext(name)
+    pattern = re.escape(os.path.normcase(base)) + r"(_\d+)?" + re.escape(os.path.normcase(ext))
+    return re.fullmatch(pattern, os.path.normcase(os.path.basename(path))) is not None
+
+
+def publish(tmp_path, dest, replace=False):
+    """Rename a fully written file to dest in one step.
+
+    Without replace, raises FileExistsError instead of overwriting a file
+    that appeared since the listing (e.g. written by another machine).
+    """
+    if replace:
+        os.replace(tmp_path, dest)
+    elif os.name == "nt":
+        os.rename(tmp_path, dest)  # never overwrites on Windows
+    else:
+        try:
+            os.link(tmp_path, dest)
+        except FileExistsError:
+            raise
+        except OSError:
+            # No hard links on this file system; rename after a last check.
+            if os.path.exists(dest):
+                raise FileExistsError(dest)
+            os.rename(tmp_path, dest)
+            return
+        os.remove(tmp_path)
+
+
+# ----------------- WRITER -----------------
+
+class OutputWriter:
+    """Move staged merges to the output folder on a background thread pool."""
+
+    def __init__(self, output_folder, replace=False, max_workers=OUTPUT_WRITERS,
+                 staging_root=STAGING_DIR, run_profile=None):
+        os.makedirs(staging_root, exist_ok=True)
+        self.staging_folder = tempfile.mkdtemp(dir=staging_root)
+        self.output_folder = output_folder
+        self.replace = replace
+        self.names = OutputNames(output_folder)
+        self.run_profile = run_profile
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, unique_number, moves, replace=False, previous=None):
+        """Queue one account's [(staged_path, name), ...] moves.
+
+        Returns a future of the final paths, in the same order. replace
+        overwrites existing files of the same name for this account.
+        previous lists an earlier output of the account (volume paths); each
+        is overwritten by the volume of the same name (a renamed account
+        gets new names instead) and the ones not overwritten are removed.
+        """
+        return self._executor.submit(self._write_all, unique_number, moves, self.replace or replace,
+                                     list(previous or []))
+
+    def _write_all(self, unique_number, moves, replace, previous):
+        if self.run_profile is None:
+            return self._write_moves(moves, replace, previous)
+        with self.run_profile.span("write", unique_number):
+            return self._write_moves(moves, replace, previous)
+
+    def _write_moves(self, moves, replace, previous):
+        paths = []
+        for index, (staged_path, name) in enumerate(moves):
+            if index < len(previous) and is_copy_of(previous[index], name):
+                paths.append(self._write(staged_path, name, True, previous[index]))
+            else:
+                paths.append(self._write(staged_path, name, replace))
+        for path in set(previous) - set(paths):
+            if os.path.exists(path):
+                os.remove(path)
+        return paths
+
+    def _write(self, staged_path, name, replace, dest=None):
+        if dest:
+            name = os.path.basename(dest)
+        elif replace:
+            dest = os.path.join(self.output_folder, name)
+        else:
+            dest = self.names.reserve(name)
+        tmp_path = os.path.join(os.path.dirname(dest), f".{name}.{uuid.uuid4().hex}{PARTIAL_SUFFIX}")
+        try:
+            shutil.copyfile(staged_path, tmp_path)
+            while True:
+                try:
+                    publish(tmp_path, dest, replace)
+                    break
+                except FileExistsError:
+                    dest = self.names.reserve(name)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.remove(staged_path)
+        return dest
+
+    def close(self):
+        """Wait for queued writes and remove the staging folder."""
+        self._executor.shutdown(wait=True)
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,120 @@
+# Results report written as accounts complete.
+#
+# Each row is appended to openpyxl's write-only workbook as it arrives, so
+# neither rows nor cell objects are held in memory; the workbook itself can
+# only be saved once, on close. An account reported again (a re-merge)
+# appends a newer row, and the older one is dropped when the report is
+# updated or shard reports are combined. The optional CSV/JSONL sink is
+# flushed after every row so a run can be tailed while it is going and
+# survives a crash.
+
+import csv
+import glob
+import json
+import os
+import re
+
+# ----------------- CONFIG -----------------
+
+RESULTS_NAME = "merge_results"
+COLUMNS = [
+    "rsg number",
+    "fileno",
+    "merged",
+    "documents used",
+    "documents skipped",
+    "duplicates dropped",
+    "pages",
+    "output bytes",
+    "seconds",
+    "error",
+]
+SINKS = ("csv", "jsonl")
+
+
+# ----------------- REPORT -----------------
+
+class ResultsReport:
+    """Append-as-you-go results report with an optional line-oriented sink.
+
+    Rows for accounts reported again follow the earlier row. With
+    update=True an existing report is kept: its rows for accounts not
+    reported again are carried over (one per account, the latest) and the
+    sink is appended to.
+    """
+
+    def __init__(self, output_folder, suffix="", sink="csv", update=False):
+        import openpyxl
+        self.base = os.path.join(output_folder, RESULTS_NAME + suffix)
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+        self.ws.append(COLUMNS)
+
+        # Earlier report rows by number, written at close() unless reported again.
+        self._previous = latest_rows([self.base + ".xlsx"]) if update else {}
+
+        self.sink = sink
+        self._sink_file = None
+        self._csv = None
+        mode = "a" if update else "w"
+        if sink == "csv":
+            new_file = not (update and os.path.exists(self.base + ".csv"))
+            self._sink_file = open(self.base + ".csv", mode, newline="")
+            self._csv = csv.writer(self._sink_file)
+            if new_file:
+                self._csv.writerow(COLUMNS)
+                self._sink_file.flush()
+        elif sink == "jsonl":
+            self._sink_file = open(self.base + ".jsonl", mode)
+
+    def append(self, values):
+        """Add one account's row (values in COLUMNS order)."""
+        values = ["" if v is None else v for v in values]
+        self.ws.append(values)
+        self._previous.pop(values[0], None)
+        if self._csv:
+            self._csv.writerow(values)
+        elif self._sink_file:
+            self._sink_file.write(json.dumps(dict(zip(COLUMNS, values))) + "\n")
+        if self._sink_file:
+            self._sink_file.flush()
+
+    def close(self):
+        """Save the workbook and close the sink."""
+        for values in self._previous.values():
+            self.ws.append(values)
+        self.wb.save(self.base + ".xlsx")
+        if self._sink_file:
+            self._sink_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def latest_rows(paths):
+    """Read report rows from xlsx files, keeping the last row per account."""
+    import openpyxl
+    rows = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        wb = openpyxl.load_workbook(path, read_only=True)
+        for row in wb.active.iter_rows(min_row=2, max_col=len(COLUMNS), values_only=True):
+            rows[row[0]] = list(row)
+        wb.close()
+    return rows
+
+
+def combine_shard_results(output_folder, sink=None):
+    """Combine per-shard merge_results files into one merge_results.xlsx."""
+    shard_files = sorted(
+        glob.glob(os.path.join(output_folder, f"{RESULTS_NAME}.shard-*-of-*.xlsx")),
+        key=lambda path: int(re.search(r"shard-(\d+)-of-", path).group(1)),
+    )
+    with ResultsReport(output_folder, sink=sink) as report:
+        for row in latest_rows(shard_files).values():
+            report.append(row)
+    return len(shard_files)
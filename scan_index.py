@@ -0,0 +1,269 @@
+# Persistent scan index for the input tree.
+#
+# Each directory is stored with its mtime and its immediate subdirectories.
+# When a directory's mtime is unchanged its entries are reused as-is, so a
+# rescan only lists directories that actually changed since the last run.
+# The stat and scandir calls run ahead on the concurrent walker's thread pool,
+# while SQLite is only touched from the calling thread. walk() yields each
+# directory's documents as it goes, so merging can start before the whole
+# tree has been revalidated.
+
+import hashlib
+import itertools
+import os
+import sqlite3
+from datetime import datetime
+
+from classify import FileRecord
+from fastwalk import WALK_WORKERS, walk_tree
+
+# ----------------- CONFIG -----------------
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".document_merge")
+SQL_CHUNK_SIZE = 500
+# Bumped whenever the tables below, or what they hold, change; older indexes are rebuilt.
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    subdirs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    number TEXT NOT NULL,
+    category INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    stm_date TEXT
+);
+CREATE INDEX IF NOT EXISTS files_number ON files (number);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def default_index_path(input_folder, cache_dir=CACHE_DIR):
+    """Return the index file used for an input folder."""
+    key = hashlib.sha1(os.path.abspath(input_folder).lower().encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"scan_index_{key}.sqlite")
+
+
+DOCUMENT_COLUMNS = "number, category, stm_date, path, name"
+
+
+def document(row):
+    """Build a (path, record, name) document from a DOCUMENT_COLUMNS row."""
+    number, category, stm_date, path, name = row
+    return path, FileRecord(number, category, datetime.fromisoformat(stm_date) if stm_date else None), name
+
+
+def list_files(dir_path, accept_file, classify_file):
+    """List one directory as (sorted subdirectory names, [(name, path, record, size, mtime), ...]).
+
+    Symlinked directories are left out, so they are not followed (as in
+    parallel_walk()) and a link to a parent cannot make the walk loop.
+    """
+    subdirs = []
+    files = []
+    try:
+        entries = list(os.scandir(dir_path))
+    except OSError:
+        entries = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            if not entry.is_symlink():
+                subdirs.append(entry.name)
+            continue
+        if not accept_file(entry.name):
+            continue
+        record = classify_file(entry.name)
+        if not record:
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue  # removed since the listing
+        files.append((entry.name, entry.path, record, stat.st_size, stat.st_mtime))
+    subdirs.sort()
+    return subdirs, files
+
+
+def is_under(path, folders):
+    """True if path is one of folders or lies below one of them."""
+    while path not in folders:
+        parent = os.path.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+    return True
+
+
+# ----------------- INDEX -----------------
+
+class ScanIndex:
+    """SQLite-backed map of 9-digit numbers to their files and parsed metadata."""
+
+    def __init__(self, index_path, fingerprint=None):
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(index_path)
+        self.conn.executescript(SCHEMA)
+        self._check_fingerprint(f"{SCHEMA_VERSION}:{fingerprint or ''}")
+
+    def _check_fingerprint(self, fingerprint):
+        """Rebuild the tables when the schema or the filename rules they were parsed with changed."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'rules'").fetchone()
+        if row and row[0] == fingerprint:
+            return
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS dirs")
+            self.conn.execute("DROP TABLE IF EXISTS files")
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rules', ?)", (fingerprint,))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def walk(self, input_folder, accept_file, classify_file, max_workers=WALK_WORKERS, prune=None):
+        """Revalidate the index against the input tree, yielding each directory as it is done.
+
+        accept_file(name) decides whether a file is indexed at all and
+        classify_file(name) returns its FileRecord (None to skip it).
+        prune(root, dirname) skips a subdirectory, as in parallel_walk();
+        its index entries are kept.
+
+        Yields (dir_path, [(unique_number, (path, record, name)), ...]) in walk
+        order, so callers can start on a directory's documents while the
+        rest of the tree is still being revalidated.
+        """
+        known_dirs = {
+            path: (mtime, subdirs.split("\0") if subdirs else [])
+            for path, mtime, subdirs in self.conn.execute("SELECT path, mtime, subdirs FROM dirs")
+        }
+
+        def probe(dir_path):
+            # Runs on the pool: file system calls only, no SQLite.
+            try:
+                dir_mtime = os.stat(dir_path).st_mtime
+            except OSError:
+                return None
+            known = known_dirs.get(dir_path)
+            if known and known[0] == dir_mtime:
+                return known[1], (), dir_mtime, None
+            subdirs, files = list_files(dir_path, accept_file, classify_file)
+            return subdirs, (), dir_mtime, files
+
+        pruned = set()
+
+        def skip(root, name):
+            if prune(root, name):
+                pruned.add(os.path.join(root, name))
+                return True
+            return False
+
+        seen_dirs = set()
+        with self.conn:
+            for dir_path, _, (subdirs, _, dir_mtime, files) in walk_tree(
+                    input_folder, probe, max_workers, skip if prune else None):
+                seen_dirs.add(dir_path)
+                if files is None:
+                    documents = self._dir_documents(dir_path)
+                else:
+                    documents = self._update_dir(dir_path, dir_mtime, subdirs, files)
+                yield dir_path, documents
+
+            self._drop_missing_dirs(seen_dirs, pruned)
+
+    def _dir_documents(self, dir_path):
+        """Return the indexed documents of one unchanged directory."""
+        return [
+            (row[0], document(row))
+            for row in self.conn.execute(
+                f"SELECT {DOCUMENT_COLUMNS} FROM files WHERE dir = ? ORDER BY path", (dir_path,)
+            )
+        ]
+
+    def _update_dir(self, dir_path, dir_mtime, subdirs, files):
+        """Store one changed directory's listing from list_files().
+
+        Returns its documents like walk() yields them.
+        """
+        known = {
+            name: (size, mtime)
+            for name, size, mtime in self.conn.execute(
+                "SELECT name, size, mtime FROM files WHERE dir = ?", (dir_path,)
+            )
+        }
+        documents = []
+        for name, path, record, size, mtime in files:
+            documents.append((record.number, (path, record, name)))
+            if known.get(name) == (size, mtime):
+                continue
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, dir, name, number, category, size, mtime, stm_date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, dir_path, name, record.number, record.category, size, mtime,
+                 record.date.isoformat() if record.date else None),
+            )
+
+        for name in set(known) - {f[0] for f in files}:
+            self.conn.execute("DELETE FROM files WHERE dir = ? AND name = ?", (dir_path, name))
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, mtime, subdirs) VALUES (?, ?, ?)",
+            (dir_path, dir_mtime, "\0".join(subdirs)),
+        )
+        return documents
+
+    def _drop_missing_dirs(self, seen_dirs, pruned=()):
+        """Remove directories (and their files) that were not reached in this walk.
+
+        Directories under a pruned one were skipped, not removed, and are kept.
+        """
+        stale = [
+            path for (path,) in self.conn.execute("SELECT path FROM dirs")
+            if path not in seen_dirs and not is_under(path, pruned)
+        ]
+        for path in stale:
+            self.conn.execute("DELETE FROM dirs WHERE path = ?", (path,))
+            self.conn.execute("DELETE FROM files WHERE dir = ?", (path,))
+
+    def account_dirs(self, unique_number):
+        """Return the directories holding an account's indexed files."""
+        return {d for (d,) in self.conn.execute(
+            "SELECT DISTINCT dir FROM files WHERE number = ?", (unique_number,))}
+
+    def iter_accounts(self, filter_numbers=None):
+        """Yield (unique_number, [(path, record, name), ...]) one account at a time."""
+        query = f"SELECT {DOCUMENT_COLUMNS} FROM files"
+        if filter_numbers:
+            numbers = sorted(filter_numbers)
+            chunks = (numbers[start:start + SQL_CHUNK_SIZE] for start in range(0, len(numbers), SQL_CHUNK_SIZE))
+            cursors = (
+                self.conn.execute(
+                    f"{query} WHERE number IN ({','.join('?' for _ in chunk)}) ORDER BY number, path", chunk)
+                for chunk in chunks
+            )
+        else:
+            cursors = [self.conn.execute(f"{query} ORDER BY number, path")]
+
+        for cursor in cursors:
+            for number, rows in itertools.groupby(cursor, key=lambda r: r[0]):
+                yield number, [document(row) for row in rows]
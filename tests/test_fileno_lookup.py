@@ -0,0 +1,77 @@
+# FILENO lookup against a local SQLite stand-in for CLSMI.dbo.MASTER.
+#
+# Usage:
+#   python -m pytest tests
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fileno_lookup  # noqa: E402
+from fileno_lookup import FilenoCache, FilenoResolver  # noqa: E402
+
+ACCOUNTS = 2500  # more than SQL Server's ~2,100 parameter limit
+
+
+def make_master(accounts=ACCOUNTS):
+    """In-memory MASTER table plus the list of statements run against it."""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE MASTER (FORW_REFNO TEXT PRIMARY KEY, FILENO TEXT NOT NULL)")
+    conn.executemany(
+        "INSERT INTO MASTER (FORW_REFNO, FILENO) VALUES (?, ?)",
+        [(f"{n:09d}", f"{n:06d}") for n in range(accounts)],
+    )
+    statements = []
+    conn.set_trace_callback(statements.append)
+    return conn, statements
+
+
+def master_queries(statements):
+    return [s for s in statements if "FROM MASTER" in s]
+
+
+def test_lookup_chunks_past_parameter_limit():
+    conn, statements = make_master()
+    numbers = [f"{n:09d}" for n in range(ACCOUNTS)] + ["999999999"]
+
+    with FilenoResolver(lambda: conn, table="MASTER") as resolver:
+        fileno_map = resolver.lookup(numbers)
+
+    assert len(fileno_map) == ACCOUNTS
+    assert fileno_map["000002499"] == "002499"
+    assert "999999999" not in fileno_map
+    queries = master_queries(statements)
+    assert len(queries) == 3  # 2,501 numbers in chunks of 1,000
+    assert all(query.count("'") <= 2 * fileno_lookup.FILENO_CHUNK_SIZE for query in queries)
+
+
+def test_cache_hit_within_ttl(tmp_path):
+    conn, statements = make_master(10)
+    cache = FilenoCache(str(tmp_path / "fileno_cache.sqlite"), ttl=60)
+    numbers = [f"{n:09d}" for n in range(10)]
+
+    with FilenoResolver(lambda: conn, table="MASTER", cache=cache) as resolver:
+        first = resolver.lookup(numbers)
+    with FilenoResolver(lambda: conn, table="MASTER", cache=cache) as resolver:
+        second = resolver.lookup(numbers)
+
+    assert first == second
+    assert len(master_queries(statements)) == 1
+
+
+def test_cache_expires_after_ttl(tmp_path, monkeypatch):
+    conn, statements = make_master(10)
+    cache = FilenoCache(str(tmp_path / "fileno_cache.sqlite"), ttl=60)
+    numbers = [f"{n:09d}" for n in range(10)]
+    now = 1_000_000.0
+    monkeypatch.setattr(fileno_lookup.time, "time", lambda: now)
+
+    resolver = FilenoResolver(lambda: conn, table="MASTER", cache=cache)
+    resolver.lookup(numbers)
+    assert len(cache.get_many(numbers)) == 10
+
+    now += 61
+    assert cache.get_many(numbers) == {}
+    assert resolver.lookup(numbers)["000000009"] == "000009"
+    assert len(master_queries(statements)) == 2
@@ -2,4 +2,4 @@
 def progress_callback(progress_queue, value):
     if progress_queue is None:
         return  # no queue, nothing to do
-    progress_queue.put(value)  # value between -1 and 1
+    progress_queue.put(value)  # float between -1 and 1, or a dict instrumentation event
@@ -0,0 +1,161 @@
+# Watch-folder service mode.
+#
+# Watches the input tree for new, changed or removed documents, waits for a
+# burst of arrivals to settle, then re-merges only the 9-digit accounts that
+# were touched. Native events come from watchdog (inotify on Linux); network
+# shares, which do not deliver change events, use the polling watcher.
+
+import os
+import queue
+import time
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # polling is used instead
+    Observer = None
+
+import main
+
+# ----------------- CONFIG -----------------
+
+DEBOUNCE_SECONDS = 10.0
+POLL_INTERVAL = 30.0
+# Events that can change a document; opened/closed_no_write come from reads,
+# including the merge's own, and would re-trigger it endlessly.
+WATCHED_EVENTS = {"created", "modified", "moved", "deleted", "closed"}
+
+
+# ----------------- WATCHERS -----------------
+
+class PollingWatcher:
+    """Detect changes by comparing (size, mtime) snapshots of candidate files."""
+
+    def __init__(self, input_folder, interval=POLL_INTERVAL):
+        self.input_folder = input_folder
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+        self._next_poll = time.monotonic() + interval
+
+    def _take_snapshot(self):
+        snapshot = {}
+        stack = [self.input_folder]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif main.is_candidate(entry.name):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    snapshot[entry.path] = (stat.st_size, stat.st_mtime)
+        return snapshot
+
+    def changes(self, timeout):
+        """Return paths added, changed or removed since the last poll."""
+        wait = self._next_poll - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if time.monotonic() < self._next_poll:
+                return set()
+        self._next_poll = time.monotonic() + self.interval
+
+        snapshot = self._take_snapshot()
+        changed = {path for path, meta in snapshot.items() if self.snapshot.get(path) != meta}
+        changed.update(set(self.snapshot) - set(snapshot))
+        self.snapshot = snapshot
+        return changed
+
+    def stop(self):
+        pass
+
+
+class EventWatcher:
+    """Collect paths from native file system events."""
+
+    def __init__(self, input_folder):
+        self.events = queue.Queue()
+        handler = FileSystemEventHandler()
+        handler.on_any_event = self._on_event
+        self.observer = Observer()
+        self.observer.schedule(handler, input_folder, recursive=True)
+        self.observer.start()
+
+    def _on_event(self, event):
+        if event.is_directory or event.event_type not in WATCHED_EVENTS:
+            return
+        self.events.put(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.events.put(dest_path)
+
+    def changes(self, timeout):
+        """Return paths reported within timeout seconds."""
+        changed = set()
+        try:
+            changed.add(self.events.get(timeout=timeout))
+            while True:
+                changed.add(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        return changed
+
+    def stop(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+# ----------------- SERVICE -----------------
+
+def affected_accounts(paths):
+    """Map changed paths to the 9-digit accounts they belong to."""
+    numbers = set()
+    for path in paths:
+        name = os.path.basename(path)
+        if not main.is_candidate(name):
+            continue
+        unique_number = main.get_unique_number(name)
+        if unique_number:
+            numbers.add(unique_number)
+    return numbers
+
+
+def watch(input_folder, output_folder, debounce=DEBOUNCE_SECONDS, poll=False,
+          interval=POLL_INTERVAL, **main_options):
+    """Re-merge touched accounts as documents arrive, until interrupted."""
+    if poll or Observer is None:
+        watcher = PollingWatcher(input_folder, interval)
+    else:
+        watcher = EventWatcher(input_folder)
+    print(f"Watching {input_folder} ({type(watcher).__name__}). Press Ctrl+C to stop.")
+
+    pending = set()
+    last_change = None
+    try:
+        while True:
+            changed = affected_accounts(watcher.changes(timeout=1.0))
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+                continue
+            if pending and time.monotonic() - last_change >= debounce:
+                numbers = sorted(pending)
+                pending.clear()
+                print(f"Re-merging {len(numbers)} account(s).")
+                try:
+                    main.main(input_folder, output_folder, numbers, open_output=False,
+                              replace_outputs=True, update_report=True, **main_options)
+                except Exception as e:
+                    # e.g. the database is unreachable; retry after the next debounce
+                    print(f"Re-merge failed: {e}")
+                    pending.update(numbers)
+                    last_change = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()